@@ -0,0 +1,122 @@
+# benchmarks/bench_offer_decode.py
+"""
+So sánh các cách decode response /v3/products/{id}/offers:
+- cách cũ: model_validate(response.json()) vào OffersResponse đầy đủ
+- model_validate_json thẳng từ bytes (OffersResponse / HotOffersResponse)
+- orjson.loads + model_validate vào HotOffersResponse (nếu đã cài orjson)
+
+Payload giả lập theo đúng cấu trúc API (50-500 offer, giá theo nhiều quốc gia).
+Có thể truyền thêm file JSON response đã lưu để đo trên dữ liệu thật.
+
+Chạy từ thư mục gốc: python -m benchmarks.bench_offer_decode [recorded.json ...]
+"""
+import json
+import random
+import sys
+import time
+from typing import Callable, List, Tuple
+
+from models.g2g_models import HotOffersResponse, OffersResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+OFFER_COUNTS = (50, 100, 250, 500)
+REPEAT = 20
+COUNTRIES = ['DE', 'PL', 'FR', 'ES', 'IT', 'NL', 'US', 'GB']
+
+
+def _price_detail(rng: random.Random, value: float) -> dict:
+    return {
+        'base': {'countryCode': 'DE', 'currencyCode': 'EUR', 'value': f"{value:.2f}"},
+        'final': [
+            {'countryCode': country, 'currencyCode': 'EUR', 'value': f"{value * rng.uniform(1.0, 1.25):.2f}"}
+            for country in COUNTRIES
+        ],
+    }
+
+
+def _build_synthetic_response(offer_count: int, seed: int = 42) -> bytes:
+    rng = random.Random(seed)
+    prices = sorted(rng.uniform(1, 60) for _ in range(offer_count))
+    data = []
+    for i, price in enumerate(prices):
+        data.append({
+            'id': f"{rng.getrandbits(32):08x}-63d2-4a15-abe0-025adf3bec34",
+            'type': rng.choice(['game', 'dlc']),
+            'visibility': 'all',
+            'price': {
+                'retail': _price_detail(rng, price),
+                'business': _price_detail(rng, price * 0.95) if rng.random() < 0.3 else None,
+            },
+            'seller': {
+                'id': f"seller-{i}",
+                'name': f"Seller {i}",
+                'rating': rng.randint(80, 100),
+                'ratingsCount': rng.randint(0, 50_000),
+                'tier': rng.choice(['bronze', 'silver', 'gold', 'platinum']),
+            },
+            'inventory': {'range': rng.choice(['1-10', '11-100', '100+'])},
+        })
+    body = {'data': data, 'meta': {'page': 1, 'itemsPerPage': offer_count, 'totalResults': offer_count}}
+    return json.dumps(body).encode()
+
+
+def _decode_legacy(body: bytes) -> int:
+    return len(OffersResponse.model_validate(json.loads(body)).get_offers())
+
+
+def _decode_full_json(body: bytes) -> int:
+    return len(OffersResponse.model_validate_json(body).get_offers())
+
+
+def _decode_hot_json(body: bytes) -> int:
+    return len(HotOffersResponse.model_validate_json(body).get_offers())
+
+
+def _decode_hot_orjson(body: bytes) -> int:
+    return len(HotOffersResponse.model_validate(orjson.loads(body)).get_offers())
+
+
+def _bench(name: str, decode: Callable, body: bytes) -> float:
+    best = float('inf')
+    count = 0
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        count = decode(body)
+        best = min(best, time.perf_counter() - start)
+    print(f"  {name:<28} {best * 1000:8.2f} ms  ({count} offers, best of {REPEAT})")
+    return best
+
+
+def _load_bodies(paths: List[str]) -> List[Tuple[str, bytes]]:
+    if paths:
+        bodies = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                bodies.append((path, f.read()))
+        return bodies
+    return [(f"{count} offers (synthetic)", _build_synthetic_response(count)) for count in OFFER_COUNTS]
+
+
+def main():
+    cases = [
+        ("model_validate(json) full", _decode_legacy),
+        ("model_validate_json full", _decode_full_json),
+        ("model_validate_json hot", _decode_hot_json),
+    ]
+    if orjson is not None:
+        cases.append(("orjson + validate hot", _decode_hot_orjson))
+    else:
+        print("orjson is not installed, skipping the orjson backend.")
+
+    for label, body in _load_bodies(sys.argv[1:]):
+        print(f"{label}, {len(body) / 1024:.0f} KiB:")
+        timings = [_bench(name, decode, body) for name, decode in cases]
+        print(f"  Speedup (fastest vs old): {timings[0] / min(timings[1:]):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_row_parser.py
+"""
+So sánh Payload.from_row (kiểm tra cột CHECK trên dữ liệu thô rồi mới validate,
+lấy cột bằng itemgetter tính sẵn) với cách cũ (validate mọi hàng rồi mới lọc)
+trên một sheet giả lập 10k hàng. Cả hai đều đi qua pydantic model_validate.
+
+Chạy từ thư mục gốc: python -m benchmarks.bench_row_parser
+"""
+import random
+import time
+from typing import Callable, List
+
+from models.sheet_models import Payload
+
+ROW_COUNT = 10_000
+REPEAT = 5
+
+
+def _build_synthetic_sheet(row_count: int, seed: int = 42) -> List[List[str]]:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(row_count):
+        roll = rng.random()
+        if roll < 0.1:
+            rows.append([])  # hàng trống
+            continue
+
+        check = '1' if roll < 0.7 else '0'
+        rows.append([
+            '', check, f"Game {i}", 'Global', 'SKIP\n[01/01 00:00] ...', '2024-01-01 00:00:00',
+            f"{rng.getrandbits(32):08x}-63d2-4a15-abe0-025adf3bec34", rng.choice(['0', '1', '2']),
+            f"https://www.g2a.com/game-{i}-i{10000070000000 + i}", '', '',
+            f"{rng.uniform(0, 0.05):.3f}", f"{rng.uniform(0.05, 0.1):.3f}", '2',
+            'min-sheet-id', 'Prices', f"B{i + 2}",
+            'max-sheet-id', 'Prices', f"C{i + 2}",
+            'stock-sheet-id', 'Stock', f"D{i + 2}",
+            'blacklist-sheet-id', 'Blacklist', 'A1:A',
+            rng.choice(['', '', '30']), f"{rng.uniform(1, 50):.2f}", rng.choice(['', '60']),
+        ])
+    return rows
+
+
+def _parse_legacy(rows: List[List[str]]) -> int:
+    count = 0
+    for i, row in enumerate(rows, start=2):
+        payload = Payload.from_row_validated(row, i)
+        if payload is None or not payload.is_check_enabled:
+            continue
+        count += 1
+    return count
+
+
+def _parse_fast(rows: List[List[str]]) -> int:
+    count = 0
+    for i, row in enumerate(rows, start=2):
+        payload = Payload.from_row(row, i)
+        if payload is None:
+            continue
+        count += 1
+    return count
+
+
+def _bench(name: str, parse_sheet: Callable, rows: List[List[str]]) -> float:
+    best = float('inf')
+    count = 0
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        count = parse_sheet(rows)
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<22} {best * 1000:8.1f} ms  ({count} payloads, best of {REPEAT})")
+    return best
+
+
+def main():
+    rows = _build_synthetic_sheet(ROW_COUNT)
+    slow = _bench("model_validate (old)", _parse_legacy, rows)
+    fast = _bench("from_row (gated)", _parse_fast, rows)
+    print(f"Speedup: {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# clients/async_google_sheets_client.py
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+import httpx
+from google.auth import crypt, jwt
+
+import constants
+from clients.http_client import create_async_client, warm_up_connections
+from utils.config import settings
+from utils.rate_limiter import TokenBucket
+
+
+class AsyncGoogleSheetsClient:
+    """
+    Client Google Sheets bất đồng bộ chạy trên httpx.AsyncClient (có connection pool).
+    Cùng bề mặt get_data / batch_get_data / batch_update với GoogleSheetsClient
+    nhưng không cần thread hay lock toàn cục.
+    """
+    SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+    BASE_URL = 'https://sheets.googleapis.com/v4/spreadsheets'
+    TOKEN_LIFETIME = 3600
+
+    # Backoff mặc định (giây) khi 429 không kèm Retry-After
+    THROTTLE_BASE_DELAY = 5.0
+    THROTTLE_MAX_DELAY = 60.0
+
+    def __init__(self, key_path: str, client: Optional[httpx.AsyncClient] = None):
+        try:
+            with open(key_path, encoding='utf-8') as f:
+                key_info = json.load(f)
+            self._signer = crypt.RSASigner.from_service_account_info(key_info)
+            self._service_account_email = key_info['client_email']
+            self._token_uri = key_info.get('token_uri', 'https://oauth2.googleapis.com/token')
+        except FileNotFoundError:
+            logging.error(
+                f"Không tìm thấy file key tại: '{key_path}'. Vui lòng kiểm tra lại đường dẫn trong file settings.env.")
+            raise
+        except Exception as e:
+            logging.error(f"Lỗi khi khởi tạo AsyncGoogleSheetsClient: {e}")
+            raise
+
+        self._client = client or create_async_client(timeout=constants.DEFAULT_API_TIMEOUT)
+        self._access_token: Optional[str] = None
+        self._token_expires_at: float = 0.0
+        self._token_lock = asyncio.Lock()
+        # Quota của Sheets API tính riêng cho đọc và ghi theo từng phút
+        self._read_bucket = TokenBucket(settings.SHEETS_READ_PER_MINUTE, settings.SHEETS_RATE_BURST)
+        self._write_bucket = TokenBucket(settings.SHEETS_WRITE_PER_MINUTE, settings.SHEETS_RATE_BURST)
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def warm_up(self):
+        await asyncio.gather(
+            warm_up_connections(self._client, self._token_uri),
+            warm_up_connections(self._client, self.BASE_URL)
+        )
+
+    def get_rate_limit_stats(self) -> Dict[str, Dict[str, float]]:
+        return {'read': self._read_bucket.stats(), 'write': self._write_bucket.stats()}
+
+    def _throttle_delay(self, response: httpx.Response, attempt: int) -> float:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return min(float(retry_after), self.THROTTLE_MAX_DELAY)
+            except ValueError:
+                pass
+        return min(self.THROTTLE_BASE_DELAY * (2 ** attempt), self.THROTTLE_MAX_DELAY)
+
+    async def _get_access_token(self, force_refresh: bool = False) -> str:
+        async with self._token_lock:
+            if not force_refresh and self._access_token and time.time() < self._token_expires_at:
+                return self._access_token
+
+            now = int(time.time())
+            assertion = jwt.encode(self._signer, {
+                'iss': self._service_account_email,
+                'scope': ' '.join(self.SCOPES),
+                'aud': self._token_uri,
+                'iat': now,
+                'exp': now + self.TOKEN_LIFETIME,
+            })
+            response = await self._client.post(self._token_uri, data={
+                'grant_type': 'urn:ietf:params:oauth:grant-type:jwt-bearer',
+                'assertion': assertion.decode() if isinstance(assertion, bytes) else assertion,
+            })
+            response.raise_for_status()
+            token_data = response.json()
+            self._access_token = token_data['access_token']
+            self._token_expires_at = time.time() + int(token_data.get('expires_in', self.TOKEN_LIFETIME)) - 60
+            return self._access_token
+
+    async def _request(
+            self,
+            method: str,
+            url: str,
+            params: Optional[Any] = None,
+            json_data: Optional[Any] = None
+    ) -> Dict[str, Any]:
+        bucket = self._read_bucket if method == 'GET' else self._write_bucket
+        token_refreshed = False
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            token = await self._get_access_token()
+            response = await self._client.request(
+                method, url, params=params, json=json_data, headers={'Authorization': f'Bearer {token}'}
+            )
+            if response.status_code == 401 and not token_refreshed:
+                # Token bị thu hồi/hết hạn sớm -> lấy token mới và thử lại một lần
+                await self._get_access_token(force_refresh=True)
+                token_refreshed = True
+                continue
+            if response.status_code == 429 and attempt < settings.SHEETS_MAX_THROTTLE_RETRIES:
+                # Vượt quota: tạm dừng cả bucket rồi xếp hàng lại thay vì báo lỗi cho caller
+                delay = self._throttle_delay(response, attempt)
+                logging.warning(f"Sheets API trả 429 cho {method} {url}, chờ {delay:.1f}s rồi thử lại.")
+                bucket.pause(delay)
+                attempt += 1
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    async def get_data(self, spreadsheet_id: str, range_name: str) -> Optional[List[List[str]]]:
+        """Trả về các hàng của range ([] nếu range trống) hoặc None nếu lỗi API."""
+        try:
+            url = f"{self.BASE_URL}/{spreadsheet_id}/values/{quote(range_name, safe='')}"
+            result = await self._request('GET', url)
+            return result.get('values', [])
+        except (httpx.HTTPError, KeyError) as error:
+            logging.error(f"Đã xảy ra lỗi API khi lấy dữ liệu: {error}")
+            return None
+
+    async def get_sheet_row_count(self, spreadsheet_id: str, sheet_name: str) -> Optional[int]:
+        """Số hàng của sheet (gridProperties.rowCount), None nếu lỗi API hoặc không tìm thấy sheet."""
+        try:
+            result = await self._request('GET', f"{self.BASE_URL}/{spreadsheet_id}",
+                                         params={'fields': 'sheets.properties(title,gridProperties.rowCount)'})
+        except (httpx.HTTPError, KeyError) as error:
+            logging.error(f"Đã xảy ra lỗi API khi lấy thông tin sheet: {error}")
+            return None
+
+        for sheet in result.get('sheets', []):
+            properties = sheet.get('properties', {})
+            if properties.get('title') == sheet_name:
+                return properties.get('gridProperties', {}).get('rowCount')
+        return None
+
+    async def batch_update(self, spreadsheet_id: str, data: List[dict]) -> bool:
+        try:
+            body = {'data': data, 'valueInputOption': 'USER_ENTERED'}
+            await self._request('POST', f"{self.BASE_URL}/{spreadsheet_id}/values:batchUpdate", json_data=body)
+            return True
+        except (httpx.HTTPError, KeyError) as error:
+            logging.error(f"Đã xảy ra lỗi API khi cập nhật dữ liệu: {error}")
+            return False
+
+    async def batch_get_data(self, spreadsheet_id: str, ranges: List[str]) -> Dict[str, Any]:
+        """
+        Lấy dữ liệu từ nhiều dải ô trong cùng một spreadsheet.
+        Trả về một dictionary map từ dải ô (range) tới giá trị (value).
+        """
+        if not spreadsheet_id or not ranges:
+            return {}
+
+        try:
+            params = [('ranges', range_name) for range_name in ranges]
+            params.append(('valueRenderOption', 'UNFORMATTED_VALUE'))
+            result = await self._request('GET', f"{self.BASE_URL}/{spreadsheet_id}/values:batchGet", params=params)
+
+            value_map = {}
+            for value_range in result.get('valueRanges', []):
+                response_range = value_range.get('range')
+                if not response_range:
+                    continue
+
+                sheet_name, cell_range = response_range.split('!')
+                normalized_sheet_name = sheet_name.strip("'")
+                normalized_key = f"'{normalized_sheet_name}'!{cell_range}"
+
+                value_map[normalized_key] = value_range.get('values')
+
+            return value_map
+
+        except (httpx.HTTPError, KeyError) as error:
+            logging.error(f"Lỗi API khi batchGet dữ liệu từ {spreadsheet_id}: {error}")
+            return {}
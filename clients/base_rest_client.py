@@ -1,16 +1,21 @@
 # file: clients/base_rest_client.py
 
+import asyncio
 import json
 import logging
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional, Type
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Type
 
 import httpx
 from pydantic import BaseModel
-from tenacity import retry, stop_after_attempt, wait_exponential, RetryCallState
 
 import constants
 from clients.exceptions import QueueLimitExceededError
+from clients.http_client import create_async_client, decode_json_response, warm_up_connections
+from clients.retry_policy import CircuitBreaker, RetryBudget, RetryPolicy, endpoint_key, is_outage
+from utils.adaptive_limiter import AdaptiveLimiter
+from utils.config import settings
+from utils.ttl_cache import TTLCache, MISSING
 
 logger = logging.getLogger(__name__)
 
@@ -45,39 +50,51 @@ async def _log_failed_request(e: httpx.RequestError):
     logger.error("------------------------------")
 
 
-def _is_retryable_exception(retry_state: RetryCallState) -> bool:
-    exception = retry_state.outcome.exception()
+class _ValidatedResponse(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    model: BaseModel
 
-    if not exception:
-        return False
-
-    if isinstance(exception, QueueLimitExceededError):
-        logger.warning(f"Queue limit exceeded. Retrying... Error: {exception}")
-        return True
-
-    if isinstance(exception, httpx.RequestError):
-        if isinstance(exception, httpx.TimeoutException):
-            return False
-        logger.warning(f"Retryable network error occurred: {exception}. Retrying...")
-        return True
-    if isinstance(exception, httpx.HTTPStatusError):
-        status_code = exception.response.status_code
-        if 500 <= status_code < 600:
-            logger.warning(f"Retryable server error occurred (Status {status_code}). Retrying...")
-            return True
-
-    return False
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
 
 
 class BaseRestAPIClient(ABC):
     def __init__(self, base_url: str, headers: Optional[Dict[str, str]] = None):
         self._base_url = base_url
-        self._client = httpx.AsyncClient(
+        self._client = create_async_client(
             base_url=self._base_url,
             headers=headers or constants.DEFAULT_HEADER,
-            timeout=constants.DEFAULT_API_TIMEOUT,
-            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+            timeout=constants.DEFAULT_API_TIMEOUT
+        )
+        # Số request đồng thời tự co giãn theo phản hồi của server, dùng chung cho mọi worker
+        self._limiter = AdaptiveLimiter(
+            min_limit=settings.API_CONCURRENCY_MIN,
+            max_limit=settings.API_CONCURRENCY_MAX,
+            initial_limit=settings.API_CONCURRENCY_INITIAL,
+            decrease_factor=settings.API_CONCURRENCY_DECREASE_FACTOR
         )
+        self._retry_policy = RetryPolicy(
+            max_attempts=settings.RETRY_MAX_ATTEMPTS,
+            base_delay=settings.RETRY_BASE_DELAY,
+            max_delay=settings.RETRY_MAX_DELAY,
+            budget=RetryBudget(ratio=settings.RETRY_BUDGET_RATIO)
+        )
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        # Model đã parse kèm ETag/Last-Modified theo (endpoint, params, model) để gửi GET có điều kiện
+        self._validators: Optional[TTLCache[Tuple, _ValidatedResponse]] = None
+        if settings.HTTP_VALIDATOR_CACHE_SIZE > 0:
+            self._validators = TTLCache(
+                max_size=settings.HTTP_VALIDATOR_CACHE_SIZE,
+                default_ttl=settings.HTTP_VALIDATOR_CACHE_TTL
+            )
+        self._conditional_requests = 0
+        self._not_modified = 0
 
     async def __aenter__(self):
         return self
@@ -88,34 +105,157 @@ class BaseRestAPIClient(ABC):
     async def close(self):
         await self._client.aclose()
 
-    @retry(
-        wait=wait_exponential(multiplier=5, min=1, max=30),
-        stop=stop_after_attempt(6),
-        retry=_is_retryable_exception
-    )
+    async def warm_up(self, count: int = 1):
+        await warm_up_connections(self._client, self._base_url, count)
+
+    def _breaker_for(self, method: str, endpoint: str) -> CircuitBreaker:
+        key = endpoint_key(method, endpoint)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = self._breakers[key] = CircuitBreaker(
+                key,
+                failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+                reset_timeout=settings.CIRCUIT_RESET_TIMEOUT
+            )
+        return breaker
+
     async def _make_request(
             self,
             method: str,
             endpoint: str,
             params: Optional[Dict[str, Any]] = None,
-            json_data: Optional[Any] = None
+            json_data: Optional[Any] = None,
+            auth: Optional[httpx.Auth] = None,
+            headers: Optional[Dict[str, str]] = None
     ) -> httpx.Response:
+        breaker = self._breaker_for(method, endpoint)
+        self._retry_policy.budget.record_request()
+        attempt = 0
+        while True:
+            breaker.before_request()
+            attempt += 1
+            try:
+                response = await self._send_request(method, endpoint, params, json_data, auth, headers)
+            except asyncio.CancelledError:
+                breaker.release_probe()
+                raise
+            except Exception as e:
+                if is_outage(e):
+                    breaker.record_failure()
+                elif isinstance(e, httpx.HTTPStatusError):
+                    # Server vẫn trả lời (4xx) -> không tính là sự cố
+                    breaker.record_success()
+                else:
+                    breaker.release_probe()
+
+                if not self._retry_policy.should_retry(attempt, e):
+                    raise
+                delay = self._retry_policy.delay_for(attempt, e)
+                logger.warning(f"{method} {endpoint} failed ({e.__class__.__name__}), "
+                               f"retry {attempt}/{self._retry_policy.max_attempts - 1} in {delay:.1f}s.")
+                await asyncio.sleep(delay)
+                continue
+
+            breaker.record_success()
+            return response
+
+    async def _send_request(
+            self,
+            method: str,
+            endpoint: str,
+            params: Optional[Dict[str, Any]],
+            json_data: Optional[Any],
+            auth: Optional[httpx.Auth],
+            headers: Optional[Dict[str, str]] = None
+    ) -> httpx.Response:
+        epoch = await self._limiter.acquire()
+        backpressure = False
+        success = False
         try:
-            response = await self._client.request(method, endpoint, params=params, json=json_data)
+            response = await self._client.request(
+                method, endpoint, params=params, json=json_data, headers=headers,
+                auth=auth if auth is not None else httpx.USE_CLIENT_DEFAULT
+            )
+            if response.status_code == 304:
+                # Trả lời cho GET có điều kiện, raise_for_status coi 3xx là lỗi
+                success = True
+                return response
             response.raise_for_status()
+            success = True
             return response
         except httpx.HTTPStatusError as e:
-            if e.response.status_code == 400 and "The limit of tasks in the queue has been exceeded" in e.response.text:
+            status_code = e.response.status_code
+            if status_code == 400 and "The limit of tasks in the queue has been exceeded" in e.response.text:
                 # logger.error(f"API task queue limit exceeded: {e.response.text}")
+                backpressure = True
                 raise QueueLimitExceededError(e.response.text) from e
 
+            backpressure = status_code == 429 or status_code >= 500
             await _log_failed_request(e)
             raise
 
         except httpx.RequestError as e:
+            backpressure = isinstance(e, httpx.TimeoutException)
             await _log_failed_request(e)
             raise
 
+        finally:
+            self._limiter.release(epoch, backpressure=backpressure, success=success)
+
+    def get_concurrency_stats(self) -> Dict[str, float]:
+        return self._limiter.stats()
+
+    async def _get_model(
+            self,
+            endpoint: str,
+            response_model: Type[BaseModel],
+            params: Optional[Dict[str, Any]] = None,
+            auth: Optional[httpx.Auth] = None
+    ) -> Any:
+        """
+        GET rồi decode vào response_model. Nếu lần trước server trả ETag/Last-Modified thì gửi
+        If-None-Match/If-Modified-Since, nhận 304 thì trả lại model cũ mà không parse lại.
+        """
+        if self._validators is None:
+            response = await self._make_request(method='GET', endpoint=endpoint, params=params, auth=auth)
+            return decode_json_response(response, response_model)
+
+        key = (endpoint, tuple(sorted((params or {}).items())), response_model)
+        cached = self._validators.get(key)
+        headers = None
+        if cached is not MISSING:
+            headers = cached.conditional_headers()
+            self._conditional_requests += 1
+
+        response = await self._make_request(method='GET', endpoint=endpoint, params=params, auth=auth,
+                                            headers=headers)
+        if response.status_code == 304 and cached is not MISSING:
+            self._not_modified += 1
+            self._validators.set(key, cached)
+            return cached.model
+
+        model = decode_json_response(response, response_model)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            self._validators.set(key, _ValidatedResponse(etag, last_modified, model))
+        elif cached is not MISSING:
+            self._validators.pop(key)
+        return model
+
+    def get_validator_cache_stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._validators) if self._validators is not None else 0,
+            'conditional': self._conditional_requests,
+            'not_modified': self._not_modified,
+        }
+
+    def get_retry_stats(self) -> Dict[str, Any]:
+        return {
+            'budget_rejected': self._retry_policy.budget.rejected,
+            'open_circuits': [key for key, breaker in self._breakers.items() if breaker.state != 'closed'],
+        }
+
     @abstractmethod
     async def _prepare_payload(self, auth_required: bool, **kwargs: Any) -> Dict[str, Any]:
         raise NotImplementedError
@@ -123,11 +263,10 @@ class BaseRestAPIClient(ABC):
     async def get(self, endpoint: str, response_model: Type[BaseModel], auth_required: bool = False,
                   **kwargs: Any) -> Any:
         prepared_params = await self._prepare_payload(auth_required=auth_required, **kwargs)
-        response = await self._make_request(method='GET', endpoint=endpoint, params=prepared_params)
-        return response_model.model_validate(response.json())
+        return await self._get_model(endpoint, response_model, params=prepared_params)
 
     async def post(self, endpoint: str, response_model: Type[BaseModel], auth_required: bool = False,
                    **kwargs: Any) -> Any:
         json_payload = await self._prepare_payload(auth_required=auth_required, **kwargs)
         response = await self._make_request(method='POST', endpoint=endpoint, json_data=json_payload)
-        return response_model.model_validate(response.json())
+        return decode_json_response(response, response_model)
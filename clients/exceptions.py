@@ -10,6 +10,16 @@ class QueueLimitExceededError(APIError):
     pass
 
 
+class CircuitOpenError(APIError):
+    """Raised without calling the API while the endpoint's circuit breaker is open."""
+    pass
+
+
+class SheetReadError(APIError):
+    """Raised when a page of the main sheet cannot be read."""
+    pass
+
+
 class GraphQLClientError(Exception):
     pass
 
@@ -1,19 +1,24 @@
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Type, TypeVar, Union
 
 from httpx import Response
 
 from clients.base_rest_client import BaseRestAPIClient
-from logic.auth import AuthHandler
-from models.g2g_models import OffersResponse, OfferDetailsResponse, UpdateOfferPayload
+from logic.auth import AuthHandler, G2aAuth
+from models.g2g_models import OffersResponse, OfferDetailsResponse, UpdateOfferPayload, OwnOffersListResponse, \
+    HotOffersResponse
 
 logger = logging.getLogger(__name__)
 
+OffersModelT = TypeVar('OffersModelT', bound=Union[OffersResponse, HotOffersResponse])
+
 
 class G2aClient(BaseRestAPIClient):
     def __init__(self, auth_handler: AuthHandler):
         super().__init__(base_url="https://api.g2a.com")
         self.auth_handler = auth_handler
+        # Auth gắn theo từng request nên nhiều worker có thể gọi song song trên cùng client
+        self._auth = G2aAuth(auth_handler)
         logger.info("G2aClient initialized")
 
     async def close(self):
@@ -30,46 +35,28 @@ class G2aClient(BaseRestAPIClient):
                   auth_required: bool = False
                   ) -> Any:
 
-        if not auth_required:
-            response = await self._make_request(method='GET', endpoint=endpoint, params=params)
-            return response_model.model_validate(response.json())
-
-        original_headers = self._client.headers.copy()
-        try:
-            auth_headers = await self.auth_handler.get_auth_headers()
-
-            self._client.headers.update(auth_headers)
-
-            response = await self._make_request(method='GET', endpoint=endpoint, params=params)
-            return response_model.model_validate(response.json())
-
-        finally:
-            self._client.headers = original_headers
+        return await self._get_model(
+            endpoint, response_model, params=params, auth=self._auth if auth_required else None
+        )
 
     async def patch(self,
                     endpoint: str,
                     json_data: Optional[Dict[str, Any]] = None,
                     auth_required: bool = False
                     ) -> Response:
-        if not auth_required:
-            response = await self._make_request(method='PATCH', endpoint=endpoint, json_data=json_data)
-            return response
-
-        original_headers = self._client.headers.copy()
-        try:
-            auth_headers = await self.auth_handler.get_auth_headers()
-            self._client.headers.update(auth_headers)
-            response = await self._make_request(method='PATCH', endpoint=endpoint, json_data=json_data)
-            return response
-        finally:
-            self._client.headers = original_headers
+        return await self._make_request(
+            method='PATCH', endpoint=endpoint, json_data=json_data, auth=self._auth if auth_required else None
+        )
 
     async def get_product_offers(
             self,
             product_id: str,
             country_code: str,
-            visibility: str = "all"
-    ) -> OffersResponse:
+            visibility: str = "all",
+            page: Optional[int] = None,
+            items_per_page: Optional[int] = None,
+            response_model: Type[OffersModelT] = OffersResponse
+    ) -> OffersModelT:
         logger.info(f"Fetching offers for product {product_id} in country {country_code}")
 
         endpoint = f"/v3/products/{product_id}/offers"
@@ -77,10 +64,14 @@ class G2aClient(BaseRestAPIClient):
             "visibility": visibility,
             "countryCode": country_code,
         }
+        if page is not None:
+            params["page"] = page
+        if items_per_page is not None:
+            params["itemsPerPage"] = items_per_page
 
         return await self.get(
             endpoint=endpoint,
-            response_model=OffersResponse,
+            response_model=response_model,
             params=params,
             auth_required=True
         )
@@ -96,6 +87,16 @@ class G2aClient(BaseRestAPIClient):
             auth_required=True
         )
 
+    async def list_own_offers(self, page: int = 1, items_per_page: int = 100) -> OwnOffersListResponse:
+        logger.info(f"Listing own offers, page {page} ({items_per_page} per page)")
+
+        return await self.get(
+            endpoint="/v3/sales/offers",
+            response_model=OwnOffersListResponse,
+            params={"page": page, "itemsPerPage": items_per_page},
+            auth_required=True
+        )
+
     async def patch_offer_details(self, offer_id: str, payload: UpdateOfferPayload) -> Response:
         logger.info(f"Patching details for offer {offer_id}")
         endpoint = f"/v3/sales/offers/{offer_id}"
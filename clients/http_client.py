@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Type, TypeVar
+
+import httpx
+from pydantic import BaseModel
+
+import constants
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+_shared_transport: Optional[httpx.AsyncHTTPTransport] = None
+
+ModelT = TypeVar('ModelT', bound=BaseModel)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+_orjson_warned = False
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class _SharedTransport(httpx.AsyncBaseTransport):
+    """Bọc transport dùng chung: client.aclose() không đóng pool của các client khác."""
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        pass
+
+
+def get_shared_transport() -> httpx.AsyncHTTPTransport:
+    """Connection pool chung cho mọi client, cấu hình từ Settings."""
+    global _shared_transport
+    if _shared_transport is None:
+        http2 = settings.HTTP2_ENABLED
+        if http2 and not _http2_available():
+            logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed. Falling back to HTTP/1.1.")
+            http2 = False
+
+        _shared_transport = httpx.AsyncHTTPTransport(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+    return _shared_transport
+
+
+def create_async_client(
+        base_url: str = '',
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = constants.DEFAULT_API_TIMEOUT
+) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=base_url,
+        headers=headers,
+        timeout=timeout,
+        transport=_SharedTransport(get_shared_transport())
+    )
+
+
+def decode_json_response(response: httpx.Response, response_model: Type[ModelT]) -> ModelT:
+    """
+    Validate body JSON thẳng vào model, không dựng dict trung gian như response.json().
+    JSON_BACKEND='orjson' parse bằng orjson rồi validate (nhanh hơn với payload lớn nếu đã cài).
+    """
+    global _orjson_warned
+    if settings.JSON_BACKEND == 'orjson':
+        if orjson is not None:
+            return response_model.model_validate(orjson.loads(response.content))
+        if not _orjson_warned:
+            logger.warning("JSON_BACKEND is 'orjson' but the package is not installed. Falling back to pydantic.")
+            _orjson_warned = True
+    return response_model.model_validate_json(response.content)
+
+
+async def close_shared_transport():
+    global _shared_transport
+    if _shared_transport is not None:
+        await _shared_transport.aclose()
+        _shared_transport = None
+
+
+async def warm_up_connections(client: httpx.AsyncClient, url: str, count: int = 1):
+    """
+    Mở sẵn `count` kết nối (DNS + TLS) tới host của `url` khi khởi động.
+    Status của response không quan trọng, lỗi chỉ được ghi log.
+    """
+    async def _open():
+        try:
+            await client.head(url)
+        except httpx.HTTPError as e:
+            logger.warning(f"Connection warm-up to {url} failed: {e}")
+
+    # HTTP/2 dồn mọi request vào một kết nối nên chỉ cần mở một
+    if settings.HTTP2_ENABLED and _http2_available():
+        count = 1
+    await asyncio.gather(*(_open() for _ in range(max(1, count))))
@@ -0,0 +1,170 @@
+import collections
+import logging
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Deque, Optional
+
+import httpx
+
+from clients.exceptions import CircuitOpenError, QueueLimitExceededError
+
+logger = logging.getLogger(__name__)
+
+# Segment chứa id (số, uuid, hash...) được gộp lại để mỗi loại endpoint có một circuit breaker
+_ID_SEGMENT_PATTERN = re.compile(r'/(?=[^/]*\d)[0-9A-Za-z_-]{6,}(?=/|$)|/\d+(?=/|$)')
+
+
+def endpoint_key(method: str, endpoint: str) -> str:
+    """'/v3/sales/offers/9f1c...' -> 'GET /v3/sales/offers/{id}'."""
+    path = endpoint.split('?', 1)[0]
+    return f"{method} {_ID_SEGMENT_PATTERN.sub('/{id}', path)}"
+
+
+def is_retryable(exception: BaseException) -> bool:
+    if isinstance(exception, QueueLimitExceededError):
+        return True
+    if isinstance(exception, httpx.RequestError):
+        return True
+    if isinstance(exception, httpx.HTTPStatusError):
+        status_code = exception.response.status_code
+        return status_code == 429 or 500 <= status_code < 600
+    return False
+
+
+def is_outage(exception: BaseException) -> bool:
+    """Lỗi cho thấy server không phục vụ được (khác với bị giới hạn tốc độ hay request sai)."""
+    if isinstance(exception, httpx.RequestError):
+        return True
+    if isinstance(exception, httpx.HTTPStatusError):
+        return 500 <= exception.response.status_code < 600
+    return False
+
+
+def _retry_after_seconds(exception: BaseException) -> Optional[float]:
+    response = getattr(exception, 'response', None)
+    if response is None and isinstance(exception.__cause__, httpx.HTTPStatusError):
+        response = exception.__cause__.response
+    if response is None:
+        return None
+
+    retry_after = response.headers.get('Retry-After')
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryBudget:
+    """
+    Chỉ cho phép số lần retry trong `window` giây gần nhất không vượt quá
+    min_retries + ratio * số request, để lúc sự cố retry không nhân tải lên nhiều lần.
+    """
+
+    def __init__(self, ratio: float, min_retries: int = 10, window: float = 60.0):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._requests: Deque[float] = collections.deque()
+        self._retries: Deque[float] = collections.deque()
+        self.rejected = 0
+
+    def _trim(self, now: float):
+        cutoff = now - self.window
+        for events in (self._requests, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def record_request(self):
+        now = time.monotonic()
+        # Trim cả ở đây: khi không có lỗi thì try_spend không bao giờ chạy
+        self._trim(now)
+        self._requests.append(now)
+
+    def try_spend(self) -> bool:
+        now = time.monotonic()
+        self._trim(now)
+        if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+            self.rejected += 1
+            return False
+        self._retries.append(now)
+        return True
+
+
+class CircuitBreaker:
+    """
+    Mở mạch sau failure_threshold lỗi liên tiếp: mọi request bị từ chối ngay
+    (CircuitOpenError) trong reset_timeout giây, sau đó cho một request thử;
+    thành công thì đóng mạch, thất bại thì mở lại.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return 'open'
+        return 'half_open'
+
+    def before_request(self):
+        state = self.state
+        if state == 'open' or (state == 'half_open' and self._probe_in_flight):
+            raise CircuitOpenError(f"Circuit for {self.name} is open, failing fast.")
+        if state == 'half_open':
+            self._probe_in_flight = True
+
+    def record_success(self):
+        if self._opened_at is not None:
+            logger.info(f"Circuit for {self.name} closed.")
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._probe_in_flight = False
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logger.warning(f"Circuit for {self.name} opened after {self._failures} consecutive failures.")
+            self._opened_at = time.monotonic()
+
+    def release_probe(self):
+        """Request thử kết thúc mà không xác định được server sống hay chết."""
+        self._probe_in_flight = False
+
+
+class RetryPolicy:
+    """Full-jitter exponential backoff, ưu tiên Retry-After của server nếu có."""
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float, budget: RetryBudget):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+
+    def delay_for(self, attempt: int, exception: BaseException) -> float:
+        retry_after = _retry_after_seconds(exception)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def should_retry(self, attempt: int, exception: BaseException) -> bool:
+        """`attempt` là số lần đã thử (tính từ 1)."""
+        if attempt >= self.max_attempts or not is_retryable(exception):
+            return False
+        return self.budget.try_spend()
@@ -1,11 +1,58 @@
+import asyncio
+import json
 import logging
+import os
+import tempfile
 import time
-from typing import Dict, Optional
+from typing import AsyncGenerator, Dict, Generator, Optional, Tuple
 
 import httpx
 
+from clients.http_client import create_async_client, warm_up_connections
 from models.oauth_models import AccessTokenResponse
 from utils.config import settings
+from utils.single_flight import SingleFlight
+
+
+def _load_cached_token(path: str, client_id: str) -> Optional[Tuple[str, float]]:
+    """Đọc token còn hạn của client_id từ file cache, trả về (token, expires_at)."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            entry = json.load(f).get(client_id)
+        if entry and entry['expires_at'] > time.time():
+            return entry['access_token'], float(entry['expires_at'])
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        logging.warning(f"Ignoring unreadable token cache '{path}': {e}")
+    return None
+
+
+def _save_cached_token(path: str, client_id: str, access_token: str, expires_at: float):
+    """Ghi token vào file cache (chỉ owner đọc được), thay file một cách nguyên tử."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)
+        if not isinstance(entries, dict):
+            entries = {}
+    except (OSError, ValueError):
+        entries = {}
+
+    entries = {key: entry for key, entry in entries.items()
+               if isinstance(entry, dict) and entry.get('expires_at', 0) > time.time()}
+    entries[client_id] = {'access_token': access_token, 'expires_at': expires_at}
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    # mkstemp tạo file với quyền 0600
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.token_cache.')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 
 class AuthHandler:
@@ -19,13 +66,61 @@ class AuthHandler:
         }
         self._access_token: Optional[str] = None
         self._token_expires_at: float = 0.0
-        self._client = httpx.AsyncClient()
+        self._client = create_async_client()
 
-    async def get_auth_headers(self) -> Dict[str, str]:
+        # Dùng lại token của lần chạy trước nếu còn hạn
+        self._token_cache_path = settings.TOKEN_CACHE_PATH
+        if self._token_cache_path:
+            cached = _load_cached_token(self._token_cache_path, settings.CLIENT_ID)
+            if cached:
+                self._access_token, self._token_expires_at = cached
+                self.logger.info("Reusing cached access token.")
+        # Các caller đồng thời chờ chung một request lấy token thay vì mỗi caller gọi một lần
+        self._single_flight = SingleFlight()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Chạy task nền làm mới token trước khi hết hạn để request không phải chờ lấy token."""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        while True:
+            delay = self._token_expires_at - settings.AUTH_REFRESH_AHEAD - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            try:
+                await self._refresh_token()
+                # Tránh vòng lặp liên tục nếu token có thời hạn ngắn hơn AUTH_REFRESH_AHEAD
+                await asyncio.sleep(5)
+            except Exception as e:
+                self.logger.error(f"Background token refresh failed: {e}. Retrying in 10s.")
+                await asyncio.sleep(10)
+
+    async def _refresh_token(self):
+        await self._single_flight.do('token', self._get_new_token)
+
+    async def get_access_token(self) -> str:
         if not self._access_token or time.time() >= self._token_expires_at:
             self.logger.info("Token is invalid or expired, getting a new one.")
-            await self._get_new_token()
-        return {"Authorization": f"Bearer {self._access_token}"}
+            await self._refresh_token()
+        return self._access_token
+
+    async def get_auth_headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {await self.get_access_token()}"}
+
+    async def refresh_access_token(self, rejected_token: Optional[str] = None) -> str:
+        """
+        Lấy token mới sau khi server trả 401 cho `rejected_token`.
+        Nếu token đã được làm mới bởi request khác thì dùng luôn token hiện tại.
+        """
+        if rejected_token is not None and self._access_token != rejected_token \
+                and time.time() < self._token_expires_at:
+            return self._access_token
+        self.logger.info("Token was rejected, getting a new one.")
+        await self._refresh_token()
+        return self._access_token
 
     async def _get_new_token(self) -> None:
         self.logger.info("Requesting new token using client credentials...")
@@ -37,9 +132,45 @@ class AuthHandler:
             self._access_token = token_data.access_token
             self._token_expires_at = time.time() + token_data.expires_in - 60
             self.logger.info("Successfully acquired new access token.")
+            if self._token_cache_path:
+                try:
+                    _save_cached_token(self._token_cache_path, settings.CLIENT_ID,
+                                       self._access_token, self._token_expires_at)
+                except OSError as e:
+                    self.logger.warning(f"Could not write token cache '{self._token_cache_path}': {e}")
         except httpx.HTTPStatusError as e:
             self.logger.error(f"Token request failed: {e.response.status_code} - {e.response.text}")
             raise ConnectionError("Failed to perform token request.") from e
 
+    async def warm_up(self):
+        await warm_up_connections(self._client, self.token_url)
+
     async def close(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
         await self._client.aclose()
+
+
+class G2aAuth(httpx.Auth):
+    """
+    Gắn Bearer token vào từng request thay vì sửa header dùng chung của client.
+    Khi server trả 401, lấy token mới và gửi lại request đúng một lần.
+    """
+
+    def __init__(self, auth_handler: AuthHandler):
+        self.auth_handler = auth_handler
+
+    def sync_auth_flow(self, request: httpx.Request) -> Generator[httpx.Request, httpx.Response, None]:
+        raise RuntimeError("G2aAuth chỉ hỗ trợ httpx.AsyncClient.")
+
+    async def async_auth_flow(self, request: httpx.Request) -> AsyncGenerator[httpx.Request, httpx.Response]:
+        token = await self.auth_handler.get_access_token()
+        request.headers["Authorization"] = f"Bearer {token}"
+        response = yield request
+
+        if response.status_code == 401:
+            token = await self.auth_handler.refresh_access_token(rejected_token=token)
+            request.headers["Authorization"] = f"Bearer {token}"
+            yield request
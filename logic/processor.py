@@ -1,13 +1,13 @@
 import logging
 import random
-from typing import Optional
+from typing import List, Optional
 
+from models.g2g_models import OfferBase
 from models.logic_models import PayloadResult, CompareTarget
 from models.sheet_models import Payload
 from services.analyze_g2a_competition import CompetitionAnalysisService
 from services.g2a_service import G2AService
 from utils.g2a_logger import get_g2a_log_string
-from utils.parser import get_prod_id, get_offer_id
 from utils.utils import round_up_to_n_decimals
 
 logger = logging.getLogger(__name__)
@@ -85,6 +85,27 @@ class G2AProcessor:
 
         return abs(price1 - price2) > threshold
 
+    async def _reconcile_own_offer(self, payload: Payload, offer_id: str, product_offers: List[OfferBase]) -> Optional[str]:
+        """
+        Giá offer của mình lấy từ cache. Nếu danh sách đối thủ cho thấy giá trên G2A khác
+        giá trong cache (ai đó sửa tay, PATCH không có hiệu lực...) thì GET lại để đối chiếu.
+        Trả về offer_type mới nếu đã lấy lại, None nếu không cần.
+        """
+        own_listing = next((offer for offer in product_offers if offer.id == offer_id), None)
+        if own_listing is None or self.g2a_service.is_recently_patched(offer_id):
+            return None
+        listed_price = own_listing.get_price_value()
+        if listed_price == float('inf') or abs(listed_price - payload.current_price) <= 0.01:
+            return None
+
+        logger.info(f"Offer {offer_id} is listed at {listed_price} but cached at {payload.current_price}. Re-fetching.")
+        self.g2a_service.invalidate_offer(offer_id)
+        details = await self.g2a_service.get_offer_details_full(offer_id)
+        if not details or not details.data:
+            return None
+        payload.current_price = details.data.get_base_price()
+        return details.data.type
+
     # --- HÀM XỬ LÝ CHÍNH ---
     async def process_single_payload(self, payload: Payload) -> PayloadResult:
         if not self._validate_payload(payload):
@@ -96,7 +117,7 @@ class G2AProcessor:
             # =========================================================================
 
             # 1.1 Lấy thông tin Offer hiện tại (Bắt buộc)
-            offer_id = get_offer_id(payload.product_id)
+            offer_id = payload.parsed_offer_id
             if not offer_id:
                 return PayloadResult(status=0, payload=payload,
                                      log_message=f"Invalid Offer ID from {payload.product_id}")
@@ -134,11 +155,14 @@ class G2AProcessor:
             # =========================================================================
             # CHUẨN BỊ DỮ LIỆU ĐỐI THỦ (CHO MODE 1 & 2)
             # =========================================================================
-            prod_id_to_compare = get_prod_id(payload.product_compare)
+            prod_id_to_compare = payload.parsed_compare_product_id
             if not prod_id_to_compare:
                 return PayloadResult(status=0, payload=payload, log_message="Invalid Compare URL")
 
-            product_offers = await self.g2a_service.get_compare_price(prod_id_to_compare)
+            product_offers = await self.g2a_service.get_compare_price(
+                prod_id_to_compare, blacklist=payload.fetched_black_list
+            )
+            offer_type = await self._reconcile_own_offer(payload, offer_id, product_offers) or offer_type
 
             # Tính toán giá mục tiêu (Target Price)
             if not product_offers:
@@ -147,7 +171,9 @@ class G2AProcessor:
                 competitor_name = "No Competition"
                 analysis_result = None
             else:
-                analysis_result = self.analysis_service.analyze_g2a_competition(payload, product_offers)
+                analysis_result = self.analysis_service.analyze_g2a_competition(
+                    payload, product_offers, observed_at=product_offers.fetched_at
+                )
                 target_price = self._calc_final_price(payload, analysis_result.competitive_price)
                 competitor_name = analysis_result.competitor_name
 
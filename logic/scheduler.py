@@ -0,0 +1,142 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from models.sheet_models import Payload, SheetDiff
+from services.analyze_g2a_competition import CompetitionAnalysisService
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RowScheduler:
+    """
+    Hàng đợi ưu tiên các hàng theo thời điểm đến hạn (next due time).
+
+    Mỗi hàng có chu kỳ riêng: cột refresh_interval nếu có, ngược lại tính từ
+    mức biến động giá đối thủ mà CompetitionAnalysisService quan sát được
+    (chưa có giá đối thủ nào thì dùng max_interval).
+    Cột relax là thời gian cooldown: hàng không được lấy lại trước khi hết
+    cooldown, nhưng worker được giải phóng ngay.
+    """
+
+    def __init__(
+            self,
+            analysis_service: CompetitionAnalysisService,
+            min_interval: float = settings.SCHEDULE_MIN_INTERVAL,
+            max_interval: float = settings.SCHEDULE_MAX_INTERVAL,
+            volatility_reference: float = settings.SCHEDULE_VOLATILITY_REFERENCE
+    ):
+        self.analysis_service = analysis_service
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.volatility_reference = volatility_reference
+
+        self._heap: List[Tuple[float, int, int]] = []  # (due_at, seq, row_index)
+        self._seq = itertools.count()
+        self._payloads: Dict[int, Payload] = {}
+        self._due_at: Dict[int, float] = {}
+        self._in_flight: Set[int] = set()
+        self._cooldown_until: Dict[int, float] = {}
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    def _push(self, row_index: int, due_at: float):
+        self._due_at[row_index] = due_at
+        heapq.heappush(self._heap, (due_at, next(self._seq), row_index))
+        self._changed.set()
+
+    def apply_diff(self, diff: SheetDiff):
+        """
+        Áp dụng thay đổi của sheet chính: hàng mới và hàng vừa bị sửa cấu hình
+        được xếp chạy ngay (trừ khi đang cooldown), hàng bị xoá/tắt CHECK bị loại.
+        """
+        now = time.monotonic()
+
+        for row_index in diff.removed:
+            self._payloads.pop(row_index, None)
+            self._due_at.pop(row_index, None)
+
+        for row_index, until in list(self._cooldown_until.items()):
+            if until <= now:
+                del self._cooldown_until[row_index]
+
+        for payload in diff.added + diff.changed:
+            row_index = payload.row_index
+            self._payloads[row_index] = payload
+            if row_index not in self._in_flight:
+                self._push(row_index, max(now, self._cooldown_until.get(row_index, now)))
+
+    def interval_for(self, payload: Payload) -> float:
+        override = payload.get_refresh_interval_value()
+        if override is not None:
+            return override
+
+        # Mode 0 không so sánh giá đối thủ nên không cần chạy dày
+        if payload.get_compare_mode == 0:
+            return self.max_interval
+
+        volatility_key = self.analysis_service.volatility_key(payload)
+        volatility = self.analysis_service.get_volatility(volatility_key)
+        if volatility is None:
+            if self.analysis_service.has_sample(volatility_key):
+                # Mới có một mẫu giá -> chạy nhanh để học mức biến động
+                return self.min_interval
+            # Lần chạy không ra giá đối thủ (thiếu/sai link so sánh, không có đối thủ,
+            # mọi người bán đều trong blacklist): không chạy dày những hàng này
+            return self.max_interval
+
+        score = min(1.0, volatility / self.volatility_reference) if self.volatility_reference > 0 else 1.0
+        return self.max_interval - (self.max_interval - self.min_interval) * score
+
+    def complete(self, payload: Payload):
+        """Gọi khi worker xử lý xong một hàng để xếp lịch lần chạy tiếp theo."""
+        row_index = payload.row_index
+        self._in_flight.discard(row_index)
+
+        current = self._payloads.get(row_index)
+        if current is None:
+            return
+
+        now = time.monotonic()
+        relax = current.get_relax_value()
+        if relax:
+            self._cooldown_until[row_index] = now + relax
+            logger.info(f"Row {row_index} cooling down for {relax}s.")
+
+        interval = self.interval_for(current)
+        due_at = max(now + interval, self._cooldown_until.get(row_index, now))
+        self._push(row_index, due_at)
+        logger.debug(f"Row {row_index} next run in {due_at - now:.1f}s")
+
+    async def next_due(self) -> Payload:
+        """Chờ tới khi có một hàng đến hạn và trả về payload của hàng đó."""
+        while True:
+            timeout: Optional[float] = None
+            while self._heap:
+                due_at, _, row_index = self._heap[0]
+                if self._due_at.get(row_index) != due_at or row_index in self._in_flight:
+                    # Bản ghi cũ (hàng đã bị xoá hoặc đã xếp lại lịch)
+                    heapq.heappop(self._heap)
+                    continue
+
+                now = time.monotonic()
+                if due_at <= now:
+                    heapq.heappop(self._heap)
+                    del self._due_at[row_index]
+                    self._in_flight.add(row_index)
+                    return self._payloads[row_index]
+
+                timeout = due_at - now
+                break
+
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
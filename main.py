@@ -4,19 +4,22 @@ from datetime import datetime
 from typing import Optional, Tuple, Dict, Any
 
 from clients.g2g_client import G2aClient
-from clients.google_sheets_client import GoogleSheetsClient
+from clients.async_google_sheets_client import AsyncGoogleSheetsClient
+from clients.http_client import close_shared_transport
 from logic.auth import AuthHandler
 from logic.processor import G2AProcessor
+from logic.scheduler import RowScheduler
 from services.analyze_g2a_competition import CompetitionAnalysisService
 from services.g2a_service import G2AService
+from services.log_sink import SheetLogSink
 from services.sheet_service import SheetService
+from services.snapshot_store import SnapshotStore
 from utils.config import settings
 from utils.utils import calculate_formula
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logging.getLogger("httpx").setLevel(logging.ERROR)
 logging.getLogger("httpcore").setLevel(logging.ERROR)
-logging.getLogger("googleapiclient").setLevel(logging.WARNING)
 
 # Lấy số worker từ config (Mặc định là 1 nếu không có file config)
 CONCURRENT_WORKERS = getattr(settings, 'WORKERS', 1)
@@ -24,24 +27,16 @@ CONCURRENT_WORKERS = getattr(settings, 'WORKERS', 1)
 
 async def process_row_wrapper(
         payload,
-        sheet_service: SheetService,
         processor: G2AProcessor,
-        g2a_service: G2AService,
-        worker_semaphore: asyncio.Semaphore,
-        google_sheets_lock: asyncio.Semaphore
+        g2a_service: G2AService
 ) -> Optional[Tuple[Any, Dict[str, Any]]]:
     """
-    Worker xử lý 1 hàng.
+    Worker xử lý 1 hàng (payload đã được hydrate trong refresh_schedule).
     """
     try:
         logging.info(f"Start processing row {payload.row_index} ({payload.product_name})...")
 
-        async with google_sheets_lock:
-            hydrated_payload = await asyncio.to_thread(
-                sheet_service.fetch_data_for_payload, payload
-            )
-
-        result = await processor.process_single_payload(hydrated_payload)
+        result = await processor.process_single_payload(payload)
         log_data = None
 
         if result.status == 1 and result.final_price is not None and result.offer_id and result.offer_type:
@@ -53,21 +48,21 @@ async def process_row_wrapper(
                         offer_type=result.offer_type,
                         new_price=result.final_price.price,
                         business_price=bussiness_price,
-                        stock=hydrated_payload.fetched_stock
+                        stock=payload.fetched_stock
                     )
                 else:
                     update_successful = await g2a_service.update_offer_price(
                         offer_id=result.offer_id,
                         offer_type=result.offer_type,
                         new_price=result.final_price.price,
-                        stock=hydrated_payload.fetched_stock
+                        stock=payload.fetched_stock
                     )
             else:
                 update_successful = await g2a_service.update_offer_price(
                     offer_id=result.offer_id,
                     offer_type=result.offer_type,
                     new_price=result.final_price.price,
-                    stock=hydrated_payload.fetched_stock
+                    stock=payload.fetched_stock
                 )
 
             if update_successful:
@@ -89,15 +84,6 @@ async def process_row_wrapper(
                 'last_update': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
 
-        if payload.relax:
-            try:
-                sleep_time = int(payload.relax)
-                if sleep_time > 0:
-                    logging.info(f"Row {payload.row_index} relaxing for {sleep_time}s...")
-                    await asyncio.sleep(sleep_time)
-            except (ValueError, TypeError):
-                pass # Bỏ qua nếu cấu hình relax không phải số
-
         if log_data:
             return (payload, log_data)
         return None
@@ -106,110 +92,195 @@ async def process_row_wrapper(
         logging.error(f"Error processing row {payload.row_index}: {e}", exc_info=True)
         return (payload, {'note': f"Error: {e}"})
 
-    finally:
-        # Giải phóng slot worker
-        worker_semaphore.release()
 
+async def _row_worker(
+        worker_id: int,
+        scheduler: RowScheduler,
+        log_sink: SheetLogSink,
+        processor: G2AProcessor,
+        g2a_service: G2AService
+):
+    """
+    Worker lấy liên tục hàng đến hạn từ scheduler, không chờ các worker khác.
+    """
+    while True:
+        payload = await scheduler.next_due()
+        try:
+            result = await process_row_wrapper(
+                payload=payload,
+                processor=processor,
+                g2a_service=g2a_service
+            )
+            if result is not None:
+                log_sink.put(*result)
+        except Exception as e:
+            logging.error(f"Worker {worker_id} failed on row {payload.row_index}: {e}", exc_info=True)
+        finally:
+            scheduler.complete(payload)
 
-async def run_automation(
+
+def warm_start(snapshot_store: SnapshotStore, g2a_service: G2AService):
+    """
+    Nạp offer của mình và danh sách đối thủ còn đủ mới từ snapshot của lần chạy trước
+    để giảm số request lúc khởi động. Các hàng vẫn chỉ được xếp lịch sau refresh_schedule
+    đầu tiên (hàng chờ lâu nhất chạy trước), nên giá không bao giờ được tính từ min/max/blacklist cũ.
+    """
+    own_offers, competitors = snapshot_store.load_offers(
+        max_age=settings.SNAPSHOT_MAX_AGE,
+        competitor_max_age=settings.SNAPSHOT_COMPETITOR_MAX_AGE
+    )
+    g2a_service.load_warm_state(own_offers, competitors)
+
+
+async def save_snapshot(snapshot_store: SnapshotStore, g2a_service: G2AService):
+    own_offers, competitors, updated_offer_ids = g2a_service.drain_snapshot_changes()
+    await asyncio.to_thread(
+        snapshot_store.save_offers, own_offers, competitors, updated_offer_ids, settings.SNAPSHOT_MAX_AGE
+    )
+
+
+async def refresh_schedule(
         sheet_service: SheetService,
-        processor: G2AProcessor,
-        g2a_service: G2AService,
-        google_sheets_lock: asyncio.Semaphore
+        scheduler: RowScheduler,
+        wait_before_apply: Optional[asyncio.Task] = None
 ):
-    worker_semaphore = asyncio.Semaphore(CONCURRENT_WORKERS)
+    """
+    Đọc lại sheet chính, hydrate toàn bộ hàng trong một lượt
+    và đồng bộ danh sách hàng vào scheduler.
+    `wait_before_apply`: task phải xong trước khi giao hàng cho worker (vẫn chạy song song với việc đọc sheet).
+    """
+    logging.info("Fetching payloads from Google Sheets...")
 
-    batch_size = CONCURRENT_WORKERS
+    diff = await sheet_service.get_payload_diff()
+
+    if diff is None:
+        logging.warning("Could not read the main sheet. Keeping current schedule.")
+        return
+
+    await sheet_service.hydrate_payloads(diff.payloads)
+    if wait_before_apply:
+        await wait_before_apply
+
+    if diff.has_changes:
+        scheduler.apply_diff(diff)
+    logging.info(f"Scheduler is tracking {len(scheduler)} rows.")
+    logging.info(f"Sheets rate limiter: {sheet_service.client.get_rate_limit_stats()}")
 
-    try:
-        logging.info("Fetching payloads from Google Sheets...")
 
-        all_payloads = await asyncio.to_thread(
-            sheet_service.get_payloads_to_process
+async def run_automation(
+        sheet_service: SheetService,
+        processor: G2AProcessor,
+        g2a_service: G2AService,
+        scheduler: RowScheduler,
+        log_sink: SheetLogSink,
+        snapshot_store: Optional[SnapshotStore] = None
+):
+    logging.info(f"Starting {CONCURRENT_WORKERS} workers...")
+    workers = [
+        asyncio.create_task(
+            _row_worker(
+                worker_id=i,
+                scheduler=scheduler,
+                log_sink=log_sink,
+                processor=processor,
+                g2a_service=g2a_service
+            )
         )
+        for i in range(CONCURRENT_WORKERS)
+    ]
 
-        if not all_payloads:
-            logging.info("No payloads to process.")
-            return
-
-        total_payloads = len(all_payloads)
-        logging.info(
-            f"Found {total_payloads} payloads. Processing with {CONCURRENT_WORKERS} workers (Batch size: {batch_size})...")
-
-        for i in range(0, total_payloads, batch_size):
-            batch_payloads = all_payloads[i: i + batch_size]
-
-            current_batch_num = (i // batch_size) + 1
-            logging.info(
-                f"--- Batch {current_batch_num}: Processing rows {i + 1} to {min(i + batch_size, total_payloads)} ---")
-
-            tasks = []
-            for payload in batch_payloads:
-                await worker_semaphore.acquire()
-                task = asyncio.create_task(
-                    process_row_wrapper(
-                        payload=payload,
-                        sheet_service=sheet_service,
-                        processor=processor,
-                        g2a_service=g2a_service,
-                        worker_semaphore=worker_semaphore,
-                        google_sheets_lock=google_sheets_lock
-                    )
-                )
-                tasks.append(task)
+    async def _refresh_own_offers():
+        try:
+            await g2a_service.refresh_own_offers()
+        except Exception as e:
+            logging.error(f"Error refreshing own offers: {e}", exc_info=True)
 
-            results = await asyncio.gather(*tasks)
+    first_round = True
+    try:
+        while True:
+            # Danh sách offer của mình được lấy song song với việc đọc sheet. Round đầu index còn trống:
+            # chờ lấy xong rồi mới giao hàng cho worker, nếu không mỗi hàng lại GET offer riêng
+            own_offers_task = asyncio.create_task(_refresh_own_offers()) if settings.OWN_OFFERS_BULK_REFRESH else None
+            try:
+                logging.info("===== REFRESH SCHEDULE =====")
+                await refresh_schedule(sheet_service, scheduler, own_offers_task if first_round else None)
+            except Exception as e:
+                logging.critical(f"Error refreshing schedule: {e}", exc_info=True)
+            if own_offers_task:
+                await own_offers_task
+            first_round = False
 
-            updates_to_push = [res for res in results if res is not None]
+            g2a_client = g2a_service.g2a_client
+            logging.info(f"G2A concurrency: {g2a_client.get_concurrency_stats()}, "
+                         f"retries: {g2a_client.get_retry_stats()}, "
+                         f"conditional GETs: {g2a_client.get_validator_cache_stats()}, "
+                         f"competitor cache: {g2a_service.get_competitor_cache_stats()}")
 
-            if updates_to_push:
-                logging.info(f"Batch {current_batch_num} done. Updating Sheet logs...")
-                await asyncio.to_thread(
-                    sheet_service.batch_update_logs, updates_to_push
-                )
-            else:
-                logging.info(f"Batch {current_batch_num} done. Nothing to log.")
+            if snapshot_store:
+                try:
+                    await save_snapshot(snapshot_store, g2a_service)
+                except Exception as e:
+                    logging.error(f"Error saving snapshot: {e}", exc_info=True)
 
-        logging.info("All batches processed successfully.")
+            await asyncio.sleep(settings.SHEET_REFRESH_INTERVAL)
 
-    except Exception as e:
-        logging.critical(f"Error in run_automation: {e}", exc_info=True)
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
 
 
 async def main():
-    google_sheets_lock = asyncio.Semaphore(1)
-
+    g_client = None
     auth_handler = None
     g2a_client = None
+    log_sink = None
+    snapshot_store = None
 
     try:
         logging.info("Initializing services...")
-        g_client = GoogleSheetsClient(settings.GOOGLE_KEY_PATH)
+        g_client = AsyncGoogleSheetsClient(settings.GOOGLE_KEY_PATH)
         sheet_service = SheetService(client=g_client)
 
         auth_handler = AuthHandler()
+        auth_handler.start()
         g2a_client = G2aClient(auth_handler=auth_handler)
         g2a_service = G2AService(g2a_client=g2a_client)
 
         analysis_service = CompetitionAnalysisService()
         processor = G2AProcessor(g2a_service=g2a_service, analysis_service=analysis_service)
+        scheduler = RowScheduler(analysis_service=analysis_service)
+
+        if settings.SNAPSHOT_PATH:
+            snapshot_store = SnapshotStore(settings.SNAPSHOT_PATH)
+            try:
+                warm_start(snapshot_store, g2a_service)
+            except Exception as e:
+                logging.error(f"Could not load snapshot, starting cold: {e}", exc_info=True)
+
+        log_sink = SheetLogSink(sheet_service=sheet_service)
+        log_sink.start()
+
+        # Mở sẵn kết nối (DNS + TLS) để round đầu không phải chờ handshake
+        await asyncio.gather(
+            g_client.warm_up(),
+            auth_handler.warm_up(),
+            g2a_client.warm_up(count=min(CONCURRENT_WORKERS, settings.HTTP_WARMUP_CONNECTIONS))
+        )
 
         logging.info("Services ready.")
 
         while True:
             try:
-                logging.info("===== NEW ROUND =====")
-
                 await run_automation(
                     sheet_service=sheet_service,
                     processor=processor,
                     g2a_service=g2a_service,
-                    google_sheets_lock=google_sheets_lock
+                    scheduler=scheduler,
+                    log_sink=log_sink,
+                    snapshot_store=snapshot_store
                 )
 
-                logging.info(f"Round finished. Sleep {settings.SLEEP_TIME}s.")
-                await asyncio.sleep(settings.SLEEP_TIME)
-
             except asyncio.CancelledError:
                 break
             except Exception as e:
@@ -217,10 +288,22 @@ async def main():
                 await asyncio.sleep(30)
 
     finally:
+        # Ghi nốt log còn trong hàng đợi trước khi thoát (kể cả khi Ctrl-C)
+        if log_sink:
+            await log_sink.close()
+        if snapshot_store:
+            try:
+                await save_snapshot(snapshot_store, g2a_service)
+            except Exception as e:
+                logging.error(f"Error saving snapshot: {e}", exc_info=True)
+            snapshot_store.close()
         if auth_handler:
             await auth_handler.close()
         if g2a_client:
             await g2a_client.close()
+        if g_client:
+            await g_client.close()
+        await close_shared_transport()
 
 
 if __name__ == "__main__":
@@ -30,11 +30,9 @@ class InventoryInfo(BaseModel):
     range: str
 
 
-class Offer(BaseModel):
+class OfferBase(BaseModel):
+    """Phần chung của Offer (đầy đủ) và HotOffer (chỉ các trường logic tính giá cần)."""
     id: str
-    price: Price
-    seller: SellerInfo
-    inventory: InventoryInfo
 
     def get_price_value(self) -> float:
         if not self.price or not self.price.retail or not self.price.retail.base:
@@ -51,6 +49,36 @@ class Offer(BaseModel):
         return self.seller.name if self.seller and self.seller.name else "Unknown Seller"
 
 
+class Offer(OfferBase):
+    price: Price
+    seller: SellerInfo
+    inventory: InventoryInfo
+
+
+# --- Model "hot": chỉ dựng các trường mà get_price_value / get_seller_name đọc,
+# dùng cho đường gọi API đối thủ lặp lại liên tục. Các trường khác trong JSON bị bỏ qua.
+class HotPriceInfo(BaseModel):
+    currency_code: str = Field(..., alias='currencyCode')
+    value: str
+
+
+class HotPriceDetail(BaseModel):
+    base: HotPriceInfo
+
+
+class HotPrice(BaseModel):
+    retail: HotPriceDetail
+
+
+class HotSellerInfo(BaseModel):
+    name: str
+
+
+class HotOffer(OfferBase):
+    price: HotPrice
+    seller: HotSellerInfo
+
+
 class MetaInfo(BaseModel):
     page: int
     items_per_page: int = Field(..., alias='itemsPerPage')
@@ -72,6 +100,14 @@ class OffersResponse(BaseModel):
         return min(offers, key=lambda offer: offer.get_price_value())
 
 
+class HotOffersResponse(BaseModel):
+    data: Optional[List[HotOffer]]
+    meta: Optional[MetaInfo]
+
+    def get_offers(self) -> List[HotOffer]:
+        return self.data if self.data is not None else []
+
+
 class OfferProductInfo(BaseModel):
     id: str
     name: str
@@ -107,6 +143,14 @@ class OfferDetailsResponse(BaseModel):
     data: OfferDetails
 
 
+class OwnOffersListResponse(BaseModel):
+    data: Optional[List[OfferDetails]] = None
+    meta: Optional[MetaInfo] = None
+
+    def get_offers(self) -> List[OfferDetails]:
+        return self.data if self.data is not None else []
+
+
 class UpdatePricePayload(BaseModel):
     retail: str
     business: Optional[str] = None
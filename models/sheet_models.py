@@ -1,9 +1,13 @@
 # models/sheet_models.py
 import logging
-from typing import Annotated, List, Optional, ClassVar, Dict, Any
+from operator import itemgetter
+from typing import Annotated, List, Optional, ClassVar, Dict, Any, Callable, Tuple, NamedTuple
 
 from pydantic import BaseModel, ValidationError, computed_field
 
+from utils.config import settings
+from utils.parser import get_offer_id, get_prod_id
+
 
 def _col_to_index(col_name: str) -> int:
     """Convert a column letter (e.g., 'A', 'B', ..., 'Z', 'AA', 'AB', ...) to a zero-based index."""
@@ -13,11 +17,34 @@ def _col_to_index(col_name: str) -> int:
     return index - 1
 
 
+def _index_to_col(index: int) -> str:
+    """Convert a zero-based index back to a column letter (e.g., 0 -> 'A', 28 -> 'AC')."""
+    letters = ''
+    index += 1
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+class _RowParser(NamedTuple):
+    getter: Callable[[List[str]], Tuple[Any, ...]]
+    width: int
+    field_names: Tuple[str, ...]
+
+
 class BaseGSheetModel(BaseModel):
     row_index: int
 
     _index_map: ClassVar[Optional[Dict[str, int]]] = None
     _col_map: ClassVar[Optional[Dict[str, str]]] = None
+    # itemgetter lấy tất cả các cột đã map trong một lần gọi, tính sẵn cho from_row
+    _row_parser: ClassVar[Optional[_RowParser]] = None
+
+    # Cột "cổng": hàng có giá trị khác _gate_value bị bỏ qua trước khi parse các cột khác
+    _gate_field: ClassVar[Optional[str]] = None
+    _gate_value: ClassVar[Optional[str]] = None
+    _gate_index: ClassVar[Optional[int]] = None
 
     @classmethod
     def _build_maps_if_needed(cls):
@@ -40,8 +67,59 @@ class BaseGSheetModel(BaseModel):
         cls._col_map = col_map
         # logging.info(f"Built index map: {cls._index_map}")
 
+    @classmethod
+    def last_column(cls) -> str:
+        """Cột xa nhất mà model map tới, dùng để giới hạn range khi đọc sheet."""
+        cls._build_maps_if_needed()
+        return _index_to_col(max(cls._index_map.values()))
+
+    @classmethod
+    def _compile_row_parser(cls):
+        if cls._row_parser is not None:
+            return
+
+        cls._build_maps_if_needed()
+        field_names = tuple(cls._index_map)
+        indexes = [cls._index_map[field_name] for field_name in field_names]
+        cls._gate_index = cls._index_map.get(cls._gate_field) if cls._gate_field else None
+        cls._row_parser = _RowParser(
+            getter=itemgetter(*indexes) if len(indexes) > 1 else (lambda row: (row[indexes[0]],)),
+            width=max(indexes) + 1,
+            field_names=field_names
+        )
+
     @classmethod
     def from_row(cls, row_data: List[str], row_index: int) -> Optional['BaseGSheetModel']:
+        """
+        Kiểm tra cột cổng trên dữ liệu thô trước (hàng bị tắt không phải validate),
+        lấy các cột bằng itemgetter đã tính sẵn rồi validate như from_row_validated.
+        """
+        cls._compile_row_parser()
+        parser = cls._row_parser
+
+        row_length = len(row_data)
+        if row_length < parser.width:
+            row_data = row_data + [''] * (parser.width - row_length)
+
+        gate_index = cls._gate_index
+        if gate_index is not None and row_data[gate_index] != cls._gate_value:
+            return None
+
+        data_dict = {
+            field_name: value if value != '' else None
+            for field_name, value in zip(parser.field_names, parser.getter(row_data))
+        }
+        if not any(data_dict.values()):
+            return None
+
+        data_dict['row_index'] = row_index
+        try:
+            return cls.model_validate(data_dict)
+        except ValidationError:
+            return None
+
+    @classmethod
+    def from_row_validated(cls, row_data: List[str], row_index: int) -> Optional['BaseGSheetModel']:
         cls._build_maps_if_needed()
 
         data_dict = {}
@@ -56,7 +134,7 @@ class BaseGSheetModel(BaseModel):
         data_dict['row_index'] = row_index
 
         try:
-            return cls.model_validate(data_dict)
+            model = cls.model_validate(data_dict)
         except ValidationError as e:
             product_name_index = cls._index_map.get("product_name")
             name_for_log = ""
@@ -68,6 +146,10 @@ class BaseGSheetModel(BaseModel):
             # logging.warning(f"Ignoring row {row_index} ({name_for_log}) due to validation error: {e}")
             return None
 
+        if cls._gate_field and getattr(model, cls._gate_field) != cls._gate_value:
+            return None
+        return model
+
 
 class SheetLocation(BaseModel):
     sheet_id: Optional[str] = None
@@ -76,6 +158,9 @@ class SheetLocation(BaseModel):
 
 
 class Payload(BaseGSheetModel):
+    _gate_field: ClassVar[Optional[str]] = 'is_check_enabled_str'
+    _gate_value: ClassVar[Optional[str]] = '1'
+
     is_2lai_enabled_str: Annotated[Optional[str], "A"] = None
     is_check_enabled_str: Annotated[Optional[str], "B"] = None
     product_name: Annotated[str, "C"]
@@ -105,6 +190,8 @@ class Payload(BaseGSheetModel):
     relax: Annotated[Optional[str], "AA"] = None
     min_price: Annotated[Optional[str], "AB"] = None
     business_price: Annotated[Optional[str], "AB"] = None
+    # Cột chu kỳ riêng của hàng lấy từ settings; để trống thì không đọc (các cột sau AB có thể là cột phụ)
+    refresh_interval: Annotated[Optional[str], settings.REFRESH_INTERVAL_COLUMN or None] = None
 
     fetched_min_price: Optional[float] = None
     fetched_max_price: Optional[float] = None
@@ -116,6 +203,9 @@ class Payload(BaseGSheetModel):
     current_price: Optional[float] = None
     final_price: Optional[float] = None
 
+    # Chỉ cảnh báo một lần cho mỗi giá trị refresh_interval sai (scheduler gọi sau mỗi lần chạy)
+    _refresh_interval_warned: bool = False
+
     # convert min_price to float
     def get_min_price_value(self) -> Optional[float]:
         if self.min_price is None:
@@ -127,6 +217,38 @@ class Payload(BaseGSheetModel):
             logging.warning(f"Could not convert min_price value '{self.min_price}' to float.")
             return None
 
+    @property
+    def parsed_offer_id(self) -> Optional[str]:
+        return get_offer_id(self.product_id) if self.product_id else None
+
+    @property
+    def parsed_compare_product_id(self) -> Optional[int]:
+        return get_prod_id(self.product_compare) if self.product_compare else None
+
+    def get_refresh_interval_value(self) -> Optional[float]:
+        """Chu kỳ (giây) cài đặt riêng cho hàng, None nếu để scheduler tự tính."""
+        if self.refresh_interval is None:
+            return None
+        try:
+            value = float(self.refresh_interval.replace(',', '.').strip())
+        except (ValueError, TypeError):
+            if not self._refresh_interval_warned:
+                self._refresh_interval_warned = True
+                logging.warning(f"Row {self.row_index}: could not convert refresh_interval value "
+                                f"'{self.refresh_interval}' to float.")
+            return None
+        return value if value > 0 else None
+
+    def get_relax_value(self) -> Optional[int]:
+        """Thời gian nghỉ (giây) sau mỗi lần xử lý hàng, None nếu không cài đặt."""
+        if self.relax is None:
+            return None
+        try:
+            value = int(self.relax)
+        except (ValueError, TypeError):
+            return None  # Bỏ qua nếu cấu hình relax không phải số
+        return value if value > 0 else None
+
     @computed_field
     @property
     def min_price_location(self) -> SheetLocation:
@@ -202,3 +324,15 @@ class Payload(BaseGSheetModel):
             })
 
         return update_requests
+
+
+class SheetDiff(BaseModel):
+    """Kết quả so sánh sheet chính giữa hai lần đọc liên tiếp."""
+    payloads: List[Payload]
+    added: List[Payload] = []
+    changed: List[Payload] = []
+    removed: List[int] = []
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
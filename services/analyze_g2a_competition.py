@@ -1,16 +1,77 @@
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from models.g2g_models import Offer
+from models.g2g_models import OfferBase
 from models.logic_models import AnalysisResult
 from models.sheet_models import Payload
 
 logger = logging.getLogger(__name__)
 
+# (product_compare, blacklist đã chuẩn hoá): giá cạnh tranh là giá thấp nhất sau khi lọc blacklist,
+# nên các hàng cùng sản phẩm nhưng khác blacklist có chuỗi giá riêng
+VolatilityKey = Tuple[str, Tuple[str, ...]]
+
 
 class CompetitionAnalysisService:
 
-    def analyze_g2a_competition(self, payload: Payload, offers: List[Offer]) -> AnalysisResult:
+    def __init__(self, volatility_alpha: float = 0.3):
+        # EWMA của tỉ lệ thay đổi giá cạnh tranh, theo từng (sản phẩm so sánh, blacklist)
+        self.volatility_alpha = volatility_alpha
+        self._last_competitive_price: Dict[VolatilityKey, float] = {}
+        self._volatility: Dict[VolatilityKey, float] = {}
+        # Thời điểm lấy danh sách đối thủ của mẫu gần nhất: cùng một danh sách (từ cache)
+        # chỉ được tính một lần, nếu không EWMA bị kéo về 0 bởi các mẫu giống hệt nhau
+        self._last_observed_at: Dict[VolatilityKey, float] = {}
+
+    @staticmethod
+    def volatility_key(payload: Payload) -> Optional[VolatilityKey]:
+        if not payload.product_compare:
+            return None
+        blacklist = tuple(sorted({seller.lower() for seller in payload.fetched_black_list or ()}))
+        return payload.product_compare, blacklist
+
+    def _track_volatility(
+            self,
+            key: Optional[VolatilityKey],
+            price: Optional[float],
+            observed_at: Optional[float] = None
+    ):
+        if not key or price is None or price == float('inf'):
+            return
+        if observed_at is not None:
+            if observed_at <= self._last_observed_at.get(key, float('-inf')):
+                return
+            self._last_observed_at[key] = observed_at
+
+        last_price = self._last_competitive_price.get(key)
+        self._last_competitive_price[key] = price
+        if last_price is None or last_price <= 0:
+            return
+
+        change = abs(price - last_price) / last_price
+        previous = self._volatility.get(key, 0.0)
+        self._volatility[key] = self.volatility_alpha * change + (1 - self.volatility_alpha) * previous
+
+    def get_volatility(self, key: Optional[VolatilityKey]) -> Optional[float]:
+        """
+        Trả về mức biến động giá (EWMA tỉ lệ thay đổi) của sản phẩm so sánh,
+        None nếu chưa quan sát đủ 2 lần.
+        """
+        if not key:
+            return None
+        return self._volatility.get(key)
+
+    def has_sample(self, key: Optional[VolatilityKey]) -> bool:
+        """Đã quan sát được ít nhất một giá cạnh tranh cho key này chưa."""
+        return bool(key) and key in self._last_competitive_price
+
+    def analyze_g2a_competition(
+            self,
+            payload: Payload,
+            offers: List[OfferBase],
+            observed_at: Optional[float] = None
+    ) -> AnalysisResult:
+        """`observed_at`: thời điểm danh sách offer được lấy từ API (None = luôn coi là mẫu mới)."""
         blacklist = payload.fetched_black_list or []
         filtered_offers = [
             offer for offer in offers
@@ -27,6 +88,7 @@ class CompetitionAnalysisService:
             )
 
         lowest_offer = min(filtered_offers, key=lambda offer: offer.get_price_value())
+        self._track_volatility(self.volatility_key(payload), lowest_offer.get_price_value(), observed_at)
 
         min_price_val = payload.get_min_price_value()
         sellers_below_min = []
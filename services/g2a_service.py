@@ -1,32 +1,221 @@
+import asyncio
+import json
 import logging
-from typing import List, Optional, Dict, Any
+import math
+import time
+from typing import List, Optional, Dict, Any, Tuple, Iterable, Set
 
-from models.g2g_models import Offer, UpdatePricePayload, UpdateInventoryPayload, UpdateOfferVariantPayload, \
-    UpdateOfferPayload, OfferDetailsResponse
+from models.g2g_models import HotOffer, HotOffersResponse, UpdatePricePayload, UpdateInventoryPayload, \
+    UpdateOfferVariantPayload, UpdateOfferPayload, OfferDetailsResponse, OwnOffersListResponse
+from services.snapshot_store import CompetitorKey
+from utils.config import settings
+from utils.single_flight import SingleFlight
+from utils.ttl_cache import TTLCache, MISSING
 
 logger = logging.getLogger(__name__)
 
 
+class CompetitorOffers(list):
+    """Danh sách offer đối thủ kèm thời điểm lấy từ API, để phân biệt lần lấy mới với dữ liệu từ cache."""
+
+    def __init__(self, offers: Iterable[HotOffer] = (), fetched_at: Optional[float] = None):
+        super().__init__(offers)
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+
+class CompetitorListing:
+    """
+    Các trang listing đã đọc của một (prod_id, country), dùng chung cho mọi blacklist.
+    Giả định: G2A trả offer theo giá tăng dần (rẻ nhất trước), nên người bán hợp lệ đầu tiên
+    là người rẻ nhất và không cần đọc tiếp. Hàng có blacklist chặt hơn đọc thêm trang
+    và nối vào listing này thay vì lấy lại từ đầu.
+    """
+
+    def __init__(self, fetched_at: Optional[float] = None):
+        self.offers: List[HotOffer] = []
+        self.pages_read = 0
+        self.exhausted = False
+        # Thời điểm đọc trang đầu: các trang nối thêm sau đó không làm listing "mới" hơn
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+    def add_page(self, page_offers: List[HotOffer], total_results: int):
+        self.offers.extend(page_offers)
+        self.pages_read += 1
+        if not page_offers or len(self.offers) >= total_results or self.pages_read >= settings.COMPETITOR_MAX_PAGES:
+            self.exhausted = True
+
+    def is_decided(self, blacklist: Set[str]) -> bool:
+        """
+        Đủ để xác định người bán rẻ nhất không nằm trong blacklist khi đã đọc được
+        một người bán hợp lệ (các trang sau không thể rẻ hơn), hoặc hết trang / đạt COMPETITOR_MAX_PAGES.
+        """
+        return self.exhausted or any(offer.get_seller_name().lower() not in blacklist for offer in self.offers)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'offers': [offer.model_dump(mode='json', by_alias=True) for offer in self.offers],
+            'pages_read': self.pages_read,
+            'exhausted': self.exhausted,
+        })
+
+    @classmethod
+    def from_json(cls, listing_json: str, fetched_at: float) -> 'CompetitorListing':
+        data = json.loads(listing_json)
+        listing = cls(fetched_at=fetched_at)
+        listing.offers = [HotOffer.model_validate(offer) for offer in data['offers']]
+        listing.pages_read = data['pages_read']
+        listing.exhausted = data['exhausted']
+        return listing
+
+
 class G2AService:
 
     def __init__(self, g2a_client):
         self.g2a_client = g2a_client
+        # Trạng thái offer của mình: offer_id -> (details, thời điểm đối chiếu với G2A gần nhất).
+        # Giá được cập nhật từ các lần PATCH thành công, chỉ GET lại sau OWN_OFFER_RECONCILE_INTERVAL
+        self._own_offers: Dict[str, Tuple[OfferDetailsResponse, float]] = {}
+        self._patched_at: Dict[str, float] = {}
+        # Listing đối thủ theo (prod_id, country): mọi hàng cùng so với một sản phẩm dùng chung
+        # các trang đã đọc dù blacklist khác nhau, các lời gọi đồng thời cùng key chờ chung một request
+        self._competitor_cache: TTLCache[CompetitorKey, CompetitorListing] = TTLCache(
+            max_size=settings.COMPETITOR_CACHE_MAX_SIZE,
+            default_ttl=settings.COMPETITOR_CACHE_TTL
+        )
+        self._competitor_flight = SingleFlight()
+        # Thay đổi từ lần lưu snapshot trước
+        self._dirty_offer_ids: set = set()
+        self._invalidated_offer_ids: set = set()
+        # Listing vừa đọc từ API, chỉ serialize khi lưu snapshot (không làm trên đường tính giá)
+        self._fetched_competitors: Dict[CompetitorKey, CompetitorListing] = {}
 
-    async def get_compare_price(self, prod_id: int, country: str = "DE") -> List[Offer]:
-        try:
-            logger.info(f"Fetching G2A offers for product ID {prod_id} in country {country}.")
-            offers_response = await self.g2a_client.get_product_offers(
-                product_id=str(prod_id),
-                country_code=country
+    def load_warm_state(
+            self,
+            own_offers: Dict[str, Tuple[str, float]],
+            competitors: Dict[CompetitorKey, Tuple[str, float]]
+    ):
+        for offer_id, (body_json, verified_at) in own_offers.items():
+            self._own_offers[offer_id] = (OfferDetailsResponse.model_validate_json(body_json), verified_at)
+        # Listing từ snapshot vào cache với thời hạn còn lại tính từ lúc lấy từ API
+        warm_competitors = 0
+        for key, (listing_json, fetched_at) in competitors.items():
+            remaining_ttl = settings.COMPETITOR_CACHE_TTL - (time.time() - fetched_at)
+            if remaining_ttl > 0:
+                self._competitor_cache.set(key, CompetitorListing.from_json(listing_json, fetched_at), ttl=remaining_ttl)
+                warm_competitors += 1
+        logger.info(f"Loaded {len(self._own_offers)} offers and "
+                    f"{warm_competitors} competitor lists from snapshot.")
+
+    def drain_snapshot_changes(self) -> Tuple[Dict[str, Tuple[str, float]], Dict[CompetitorKey, Tuple[str, float]], set]:
+        """Trả về (offer, đối thủ, offer cần xoá) thay đổi từ lần gọi trước để lưu snapshot."""
+        own_offers = {
+            offer_id: (self._own_offers[offer_id][0].model_dump_json(by_alias=True), self._own_offers[offer_id][1])
+            for offer_id in self._dirty_offer_ids if offer_id in self._own_offers
+        }
+        competitors = {
+            key: (listing.to_json(), listing.fetched_at) for key, listing in self._fetched_competitors.items()
+        }
+        changes = (own_offers, competitors, self._invalidated_offer_ids)
+        self._dirty_offer_ids, self._fetched_competitors, self._invalidated_offer_ids = set(), {}, set()
+        return changes
+
+    def invalidate_offer(self, offer_id: str):
+        """Bỏ trạng thái đã cache khi nghi ngờ lệch với G2A, lần sau sẽ GET lại."""
+        if self._own_offers.pop(offer_id, None) is not None:
+            self._dirty_offer_ids.discard(offer_id)
+            self._invalidated_offer_ids.add(offer_id)
+
+    def _record_price_update(self, offer_id: str, new_price: float, business_price: Optional[float] = None):
+        """Áp giá vừa PATCH thành công vào cache, giữ nguyên thời điểm đối chiếu."""
+        cached = self._own_offers.get(offer_id)
+        if cached is None:
+            return
+        details, verified_at = cached
+        update = {"price": f"{new_price:.2f}"}
+        if business_price:
+            update["businessPrice"] = f"{business_price:.2f}"
+        details = details.model_copy(update={"data": details.data.model_copy(update=update)})
+        self._own_offers[offer_id] = (details, verified_at)
+        self._dirty_offer_ids.add(offer_id)
+        self._patched_at[offer_id] = time.time()
+
+    def is_recently_patched(self, offer_id: str) -> bool:
+        """Danh sách offer công khai của G2A có thể chưa kịp phản ánh lần PATCH vừa rồi."""
+        return time.time() - self._patched_at.get(offer_id, 0.0) < settings.OWN_OFFER_DRIFT_GRACE
+
+    def get_competitor_cache_stats(self) -> Dict[str, int]:
+        return {**self._competitor_cache.stats(), 'coalesced': self._competitor_flight.coalesced}
+
+    async def get_compare_price(
+            self,
+            prod_id: int,
+            country: str = "DE",
+            blacklist: Optional[Iterable[str]] = None
+    ) -> CompetitorOffers:
+        """
+        Danh sách đối thủ của sản phẩm, đủ để xác định người bán rẻ nhất không nằm trong
+        blacklist (có thể chưa phải toàn bộ listing, xem CompetitorListing.is_decided).
+        Việc lọc blacklist vẫn do caller làm, listing chỉ đọc thêm trang khi cần.
+        """
+        key = (str(prod_id), country)
+        blacklist_set = {seller.lower() for seller in blacklist or ()}
+        listing = self._competitor_cache.get(key)
+        while listing is MISSING or not listing.is_decided(blacklist_set):
+            # Có thể chờ chung lần đọc của một hàng khác blacklist: kiểm tra lại rồi đọc tiếp nếu chưa đủ
+            listing = await self._competitor_flight.do(
+                key, lambda current=listing: self._read_competitor_pages(key, current, blacklist_set)
             )
-            return offers_response.get_offers()
+            if listing is None:
+                return CompetitorOffers()
+        return CompetitorOffers(listing.offers, fetched_at=listing.fetched_at)
 
+    async def _read_competitor_pages(
+            self,
+            key: CompetitorKey,
+            listing: Any,
+            blacklist: Set[str]
+    ) -> Optional[CompetitorListing]:
+        """
+        Đọc tiếp listing (hoặc từ trang đầu nếu chưa có) tới khi đủ cho blacklist này.
+        Trả về None nếu lỗi API.
+        """
+        prod_id, country = key
+        items_per_page = max(1, settings.COMPETITOR_PAGE_SIZE)
+        if listing is MISSING:
+            listing = CompetitorListing()
+            logger.info(f"Fetching G2A offers for product ID {prod_id} in country {country}.")
+        pages_before = listing.pages_read
+
+        try:
+            while not listing.is_decided(blacklist):
+                offers_response = await self.g2a_client.get_product_offers(
+                    product_id=prod_id,
+                    country_code=country,
+                    page=listing.pages_read + 1,
+                    items_per_page=items_per_page,
+                    response_model=HotOffersResponse
+                )
+                page_offers = offers_response.get_offers()
+                meta = offers_response.meta
+                total_results = meta.total_results if meta is not None else len(listing.offers) + len(page_offers)
+                listing.add_page(page_offers, total_results)
         except ConnectionError as e:
             logger.error(f"Connection error fetching G2A offers for {prod_id}: {e}")
-            return []
+            return None
         except Exception as e:
             logger.error(f"Unexpected error fetching G2A offers for {prod_id}: {e}")
-            return []
+            return None
+
+        if listing.pages_read > 1 and listing.pages_read != pages_before:
+            logger.info(f"Read {listing.pages_read} pages ({len(listing.offers)} offers) "
+                        f"for product ID {prod_id} in country {country}.")
+
+        # Trang nối thêm không gia hạn listing: hết hạn theo thời điểm đọc trang đầu
+        remaining_ttl = settings.COMPETITOR_CACHE_TTL - (time.time() - listing.fetched_at)
+        if remaining_ttl > 0:
+            self._competitor_cache.set(key, listing, ttl=remaining_ttl)
+        self._fetched_competitors[key] = listing
+        return listing
 
     async def update_product_price(self, offer_id: str, new_price: float) -> bool:
         logger.info(f"Updating G2A offer {offer_id} with price {new_price}...")
@@ -75,10 +264,12 @@ class G2AService:
             )
 
             logger.info(f"Successfully updated price for offer {offer_id}.")
+            self._record_price_update(offer_id, new_price)
             return True
 
         except Exception as e:
             logger.error(f"Failed to update price for offer {offer_id}: {e}")
+            self.invalidate_offer(offer_id)
             return False
 
     async def update_offer_price(
@@ -111,16 +302,71 @@ class G2AService:
             )
 
             logger.info(f"Successfully updated price for offer {offer_id}.")
+            self._record_price_update(offer_id, new_price, business_price)
             return True
 
         except Exception as e:
             logger.error(f"Failed to update price for offer {offer_id}: {e}")
+            self.invalidate_offer(offer_id)
             return False
 
+    def store_offer_details(self, offer_id: str, details: OfferDetailsResponse, verified_at: Optional[float] = None):
+        self._own_offers[offer_id] = (details, verified_at if verified_at is not None else time.time())
+        self._dirty_offer_ids.add(offer_id)
+        self._invalidated_offer_ids.discard(offer_id)
+
+    async def _list_own_offers_page(self, page: int, items_per_page: int) -> Optional[OwnOffersListResponse]:
+        try:
+            return await self.g2a_client.list_own_offers(page=page, items_per_page=items_per_page)
+        except Exception as e:
+            logger.error(f"Failed to list own offers page {page}: {e}")
+            return None
+
+    async def refresh_own_offers(self) -> int:
+        """
+        Lấy toàn bộ offer của mình qua /v3/sales/offers (trang đầu trước để biết tổng số,
+        các trang còn lại gọi song song) và cập nhật cache. Trả về số offer đã cập nhật.
+        """
+        items_per_page = max(1, settings.OWN_OFFERS_PAGE_SIZE)
+        first_page = await self._list_own_offers_page(1, items_per_page)
+        if first_page is None:
+            return 0
+
+        pages = [first_page]
+        if first_page.meta is not None and first_page.meta.total_results > items_per_page:
+            total_pages = math.ceil(first_page.meta.total_results / items_per_page)
+            pages += await asyncio.gather(*(
+                self._list_own_offers_page(page, items_per_page) for page in range(2, total_pages + 1)
+            ))
+
+        now = time.time()
+        updated = 0
+        for response in pages:
+            if response is None:
+                continue
+            for offer in response.get_offers():
+                # Danh sách có thể chưa kịp phản ánh lần PATCH vừa rồi -> giữ giá trong cache
+                if self.is_recently_patched(offer.id):
+                    continue
+                self.store_offer_details(offer.id, OfferDetailsResponse(data=offer), verified_at=now)
+                updated += 1
+
+        failed_pages = sum(1 for response in pages if response is None)
+        logger.info(f"Refreshed {updated} own offers from {len(pages)} pages"
+                    + (f" ({failed_pages} pages failed)." if failed_pages else "."))
+        return updated
+
     async def get_offer_details_full(self, offer_id: str) -> Optional[OfferDetailsResponse]:
         try:
+            cached = self._own_offers.get(offer_id)
+            if cached is not None and time.time() - cached[1] < settings.OWN_OFFER_RECONCILE_INTERVAL:
+                return cached[0]
+
             # logger.info(f"Fetching full details for offer {offer_id}")
-            return await self.g2a_client.get_offer_details(offer_id)
+            details = await self.g2a_client.get_offer_details(offer_id)
+            if details is not None:
+                self.store_offer_details(offer_id, details)
+            return details
         except Exception as e:
             logger.error(f"Failed to get details for offer {offer_id}: {e}")
             return None
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from models.sheet_models import Payload
+from services.sheet_service import SheetService
+from utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class SheetLogSink:
+    """
+    Task chạy nền gom kết quả (payload, log_data) từ tất cả worker và ghi lên
+    Google Sheets theo lô: ghi khi đủ max_batch_size hàng hoặc khi hàng cũ nhất
+    đã chờ quá max_delay giây. close() ghi nốt toàn bộ phần còn lại.
+    """
+
+    def __init__(
+            self,
+            sheet_service: SheetService,
+            max_batch_size: int = settings.LOG_FLUSH_SIZE,
+            max_delay: float = settings.LOG_FLUSH_INTERVAL
+    ):
+        self.sheet_service = sheet_service
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_delay = max_delay
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def put(self, payload: Payload, log_data: Dict[str, Any]):
+        """Không chờ ghi: worker trả slot ngay sau khi đẩy kết quả vào queue."""
+        self._queue.put_nowait((payload, log_data))
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._queue.put_nowait(_STOP)
+        await self._task
+        self._task = None
+
+    async def _flush(self, pending: List[Tuple[Payload, Dict[str, Any]]]):
+        logger.info(f"Flushing logs for {len(pending)} rows to Google Sheets...")
+        try:
+            await self.sheet_service.batch_update_logs(pending)
+        except Exception as e:
+            logger.error(f"Error flushing {len(pending)} logs: {e}", exc_info=True)
+
+    async def _run(self):
+        pending: List[Tuple[Payload, Dict[str, Any]]] = []
+        deadline = 0.0
+        stopping = False
+
+        while not stopping:
+            timeout = max(0.0, deadline - time.monotonic()) if pending else None
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                if not pending:
+                    deadline = time.monotonic() + self.max_delay
+                pending.append(item)
+
+            if pending and (stopping or len(pending) >= self.max_batch_size or time.monotonic() >= deadline):
+                batch, pending = pending, []
+                await self._flush(batch)
+
+        # Ghi nốt các kết quả còn trong queue khi tắt chương trình
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                pending.append(item)
+        for i in range(0, len(pending), self.max_batch_size):
+            await self._flush(pending[i:i + self.max_batch_size])
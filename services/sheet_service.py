@@ -1,12 +1,39 @@
 # services/sheet_service.py
+import asyncio
 import logging
 import re
+import time
 from collections import defaultdict
-from typing import List, Optional, Dict, Any
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterator
 
-from clients.google_sheets_client import GoogleSheetsClient
-from models.sheet_models import Payload, SheetLocation
+from clients.async_google_sheets_client import AsyncGoogleSheetsClient
+from clients.exceptions import SheetReadError
+from models.sheet_models import Payload, SheetLocation, SheetDiff
 from utils.config import settings
+from utils.ttl_cache import TTLCache, MISSING
+
+
+_FINGERPRINT_EXCLUDED_FIELDS = ('note', 'last_update')
+_NOTE_TIMESTAMP_PATTERN = re.compile(r'\[\d{2}/\d{2} \d{2}:\d{2}\]\s*')
+_LAST_UPDATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _normalize_note(note: str) -> str:
+    """Bỏ timestamp '[dd/mm HH:MM]' để so sánh nội dung note giữa các lần ghi."""
+    return _NOTE_TIMESTAMP_PATTERN.sub('', str(note)).strip()
+
+
+def _parse_last_update(value: Optional[str]) -> float:
+    try:
+        return datetime.strptime(value, _LAST_UPDATE_FORMAT).timestamp()
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _row_fingerprint(row_data: List[Any], indexes: List[int]) -> int:
+    row_length = len(row_data)
+    return hash(tuple(row_data[idx] if idx < row_length else '' for idx in indexes))
 
 
 def _find_header_row(rows: List[List[str]], key_columns: List[str]) -> Optional[int]:
@@ -56,83 +83,341 @@ def _process_fetched_value(key: str, raw_value: Any) -> Optional[Any]:
 
 class SheetService:
 
-    def __init__(self, client: GoogleSheetsClient):
+    def __init__(self, client: AsyncGoogleSheetsClient):
         self.client = client
+        # Cache giá trị đã xử lý của các sheet phụ: (sheet_id, range, key) -> value
+        self._value_cache: TTLCache[Tuple[str, str, str], Any] = TTLCache(
+            max_size=settings.SHEET_CACHE_MAX_SIZE,
+            default_ttl=settings.SHEET_CACHE_TTL_MIN_PRICE
+        )
+        self._cache_ttl: Dict[str, float] = {
+            "min_price": settings.SHEET_CACHE_TTL_MIN_PRICE,
+            "max_price": settings.SHEET_CACHE_TTL_MAX_PRICE,
+            "stock": settings.SHEET_CACHE_TTL_STOCK,
+            "black_list": settings.SHEET_CACHE_TTL_BLACKLIST,
+        }
+        # Trạng thái sheet chính của lần đọc trước: row_index -> (fingerprint, payload hoặc None)
+        self._row_state: Dict[int, Tuple[int, Optional[Payload]]] = {}
+        self._header_row_index: Optional[int] = None
+        # Nội dung note đã ghi gần nhất (đã bỏ timestamp) và thời điểm ghi: row_index -> (note, time)
+        self._written_notes: Dict[int, Tuple[str, float]] = {}
+
+    def invalidate_spreadsheet(self, spreadsheet_id: str) -> int:
+        """Xoá toàn bộ giá trị đã cache của một spreadsheet, lần hydrate sau sẽ đọc lại."""
+        removed = self._value_cache.invalidate(lambda cache_key: cache_key[0] == spreadsheet_id)
+        logging.info(f"Invalidated {removed} cached values of spreadsheet {spreadsheet_id}.")
+        return removed
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        return self._value_cache.stats()
+
+    async def get_payloads_to_process(self) -> Optional[List[Payload]]:
+        """
+        Đọc sheet chính và trả về các hàng đang bật CHECK.
+        Trả về None nếu không đọc được sheet (khác với sheet không có hàng nào).
+        """
+        diff = await self.get_payload_diff()
+        return diff.payloads if diff is not None else None
+
+    @staticmethod
+    def _fingerprint_indexes() -> List[int]:
+        # Bỏ qua các cột do chính tool ghi (note, last_update) để không coi là hàng thay đổi
+        Payload._build_maps_if_needed()
+        return sorted({
+            col_index for field_name, col_index in Payload._index_map.items()
+            if field_name not in _FINGERPRINT_EXCLUDED_FIELDS
+        })
+
+    def _locate_header_row(self, rows: List[List[str]], offset: int = 0) -> Optional[int]:
+        """
+        Tìm header trong một trang `rows` bắt đầu ở index `offset` của sheet.
+        Trả về index tương đối trong trang, vị trí tuyệt đối được nhớ cho lần đọc sau.
+        """
+        key_columns = settings.HEADER_KEY_COLUMNS
+        # Thử lại vị trí header của lần trước trước khi quét toàn bộ
+        cached_index = self._header_row_index
+        if cached_index is not None:
+            relative_index = cached_index - offset
+            if 0 <= relative_index < len(rows) and all(key in rows[relative_index] for key in key_columns):
+                return relative_index
+
+        relative_index = _find_header_row(rows, key_columns)
+        if relative_index is not None:
+            self._header_row_index = offset + relative_index
+        return relative_index
+
+    async def _fetch_main_sheet_page(self, start_row: int, page_size: int) -> List[List[str]]:
+        range_name = f"'{settings.MAIN_SHEET_NAME}'!A{start_row}:{Payload.last_column()}{start_row + page_size - 1}"
+        rows = await self.client.get_data(settings.MAIN_SHEET_ID, range_name)
+        if rows is None:
+            raise SheetReadError(f"Cannot read {range_name}")
+        return rows
+
+    async def iter_main_sheet_pages(self) -> AsyncIterator[Tuple[int, List[List[str]]]]:
+        """
+        Đọc sheet chính theo từng trang MAIN_SHEET_PAGE_SIZE hàng, chỉ các cột mà
+        Payload map tới. Trang kế tiếp được tải trước trong lúc caller xử lý trang hiện tại.
+        Yield (số hàng trên sheet của hàng đầu trang, các hàng), bỏ qua trang trống.
+
+        Đọc tới hết số hàng thực của sheet (gridProperties.rowCount) nên một khối hàng trống
+        ở giữa không làm mất các hàng bên dưới. Nếu không lấy được rowCount thì đọc tới
+        trang trống đầu tiên nằm sau hàng cuối cùng của lần đọc trước.
+        """
+        page_size = max(1, settings.MAIN_SHEET_PAGE_SIZE)
+        start_row = 1
+        row_count_task = asyncio.create_task(
+            self.client.get_sheet_row_count(settings.MAIN_SHEET_ID, settings.MAIN_SHEET_NAME)
+        )
+        next_page = asyncio.create_task(self._fetch_main_sheet_page(start_row, page_size))
+        try:
+            row_count = await row_count_task
+            last_known_row = max(self._row_state, default=0)
+            if row_count is None:
+                logging.warning(f"Could not get the row count of the main sheet, "
+                                f"reading past row {last_known_row} until an empty page.")
+
+            while True:
+                rows = await next_page
+                next_page = None
+                end_row = start_row + page_size - 1
+                if row_count is not None:
+                    has_more = end_row < row_count
+                else:
+                    has_more = end_row < last_known_row or bool(rows)
 
-    def get_payloads_to_process(self) -> List[Payload]:
-        all_rows = self.client.get_data(settings.MAIN_SHEET_ID, settings.MAIN_SHEET_NAME)
-        if not all_rows:
+                if has_more:
+                    next_page = asyncio.create_task(self._fetch_main_sheet_page(end_row + 1, page_size))
+                if rows:
+                    yield start_row, rows
+                if not has_more:
+                    return
+                start_row = end_row + 1
+        finally:
+            for task in (row_count_task, next_page):
+                if task is not None and not task.done():
+                    task.cancel()
+                    # Lấy exception của task tải trước (nếu có) để asyncio không cảnh báo
+                    task.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+    async def get_payload_diff(self) -> Optional[SheetDiff]:
+        """
+        Đọc sheet chính (theo trang) và so sánh với lần đọc trước bằng fingerprint của từng hàng.
+        Chỉ dựng lại Payload cho các hàng mới hoặc đã thay đổi, hàng không đổi
+        dùng lại Payload cũ. Trả về None nếu không đọc được sheet.
+        """
+        previous_state = self._row_state
+        new_state: Dict[int, Tuple[int, Optional[Payload]]] = {}
+        diff = SheetDiff(payloads=[])
+        fingerprint_indexes = self._fingerprint_indexes()
+
+        has_data = False
+        start_row_on_sheet = None
+        try:
+            async for page_start, page_rows in self.iter_main_sheet_pages():
+                has_data = True
+                if start_row_on_sheet is None:
+                    header_index = self._locate_header_row(page_rows, offset=page_start - 1)
+                    if header_index is None:
+                        continue
+                    page_rows = page_rows[header_index + 1:]
+                    page_start += header_index + 1
+                    start_row_on_sheet = page_start
+
+                for i, row_data in enumerate(page_rows, start=page_start):
+                    fingerprint = _row_fingerprint(row_data, fingerprint_indexes)
+                    previous = previous_state.get(i)
+
+                    if previous is not None and previous[0] == fingerprint:
+                        payload = previous[1]
+                    else:
+                        payload = Payload.from_row(row_data, row_index=i)
+                        if payload is not None and not payload.is_check_enabled:
+                            payload = None
+
+                        was_enabled = previous is not None and previous[1] is not None
+                        if payload is not None:
+                            (diff.changed if was_enabled else diff.added).append(payload)
+                        elif was_enabled:
+                            diff.removed.append(i)
+
+                    new_state[i] = (fingerprint, payload)
+                    if payload is not None:
+                        diff.payloads.append(payload)
+        except SheetReadError as e:
+            logging.error(f"Error reading the main sheet: {e}")
+            return None
+
+        if not has_data:
             logging.warning("No data found in the main sheet.")
-            return []
+            return None
 
-        header_row_index = _find_header_row(all_rows, settings.HEADER_KEY_COLUMNS)
-        if header_row_index is None:
+        if start_row_on_sheet is None:
             logging.error(f"Cannot find header row with columns: {settings.HEADER_KEY_COLUMNS}")
             logging.error("Please check the header row in your Google Sheet.")
-            return []
+            return None
+
+        for i, (_, payload) in previous_state.items():
+            if i not in new_state and payload is not None:
+                diff.removed.append(i)
 
-        data_rows = all_rows[header_row_index + 1:]
-        start_row_on_sheet = header_row_index + 2
-        logging.info(f"Starting from index {header_row_index + 1} (row {start_row_on_sheet} on sheet).")
-        payload_list: List[Payload] = []
-        for i, row_data in enumerate(data_rows, start=start_row_on_sheet):
-            payload = Payload.from_row(row_data, row_index=i)
-            if payload and payload.is_check_enabled:
-                payload_list.append(payload)
+        # Hàng mới (gồm toàn bộ sheet ở lần đọc đầu sau khi khởi động) được xếp chạy ngay:
+        # hàng có last_update cũ nhất (chờ lâu nhất) chạy trước
+        diff.added.sort(key=lambda payload: _parse_last_update(payload.last_update))
 
-        logging.info(f"Found {len(payload_list)} payloads to process starting from row {start_row_on_sheet}.")
-        return payload_list
+        self._row_state = new_state
+        for row_index in diff.removed:
+            self._written_notes.pop(row_index, None)
+        logging.info(f"Found {len(diff.payloads)} payloads to process starting from row {start_row_on_sheet} "
+                     f"(added={len(diff.added)}, changed={len(diff.changed)}, removed={len(diff.removed)}).")
+        return diff
 
-    def update_log_for_payload(self, payload: Payload, log_data: Dict[str, Any]):
+    async def update_log_for_payload(self, payload: Payload, log_data: Dict[str, Any]):
         try:
             update_request = payload.prepare_update(
                 settings.MAIN_SHEET_NAME,
                 log_data
             )
             if update_request:
-                self.client.batch_update(settings.MAIN_SHEET_ID, update_request)
+                await self.client.batch_update(settings.MAIN_SHEET_ID, update_request)
                 logging.info(f"-> Successfully updated for row {payload.row_index} with data: {log_data}")
         except Exception as e:
             logging.error(f"Cannot update log for row {payload.row_index} ({payload.product_name}): {e}")
 
-    def fetch_data_for_payload(self, payload: Payload) -> Payload:
-        locations_to_fetch = {
-            "min_price": payload.min_price_location,
-            "max_price": payload.max_price_location,
-            "stock": payload.stock_location,
-            "black_list": payload.blacklist_location
-        }
+    async def fetch_data_for_payload(self, payload: Payload) -> Payload:
+        return (await self.hydrate_payloads([payload]))[0]
 
-        requests_by_spreadsheet = defaultdict(list)
-        range_to_key_map = {}
+    async def hydrate_payloads(self, payloads: List[Payload]) -> List[Payload]:
+        """
+        Lấy min/max/stock/blacklist cho cả round một lần.
+        Các range trùng nhau được gộp lại, mỗi spreadsheet chỉ gọi một batchGet
+        (chia thành nhiều chunk nếu có quá nhiều range), sau đó trả giá trị về
+        cho từng payload.
+        """
+        # sheet_id -> range -> [(payload, key), ...]
+        requests_by_spreadsheet: Dict[str, Dict[str, List[Tuple[Payload, str]]]] = defaultdict(dict)
 
-        for key, loc in locations_to_fetch.items():
-            if loc and loc.sheet_id and loc.sheet_name and loc.cell:
-                range_name = f"'{loc.sheet_name}'!{loc.cell}"
-                processed_ranges = _process_unbounded_range(range_name)
-                requests_by_spreadsheet[loc.sheet_id].append(processed_ranges)
-                range_to_key_map[processed_ranges] = key
+        for payload in payloads:
+            locations_to_fetch = {
+                "min_price": payload.min_price_location,
+                "max_price": payload.max_price_location,
+                "stock": payload.stock_location,
+                "black_list": payload.blacklist_location
+            }
+            for key, loc in locations_to_fetch.items():
+                if loc and loc.sheet_id and loc.sheet_name and loc.cell:
+                    range_name = _process_unbounded_range(f"'{loc.sheet_name}'!{loc.cell}")
+                    requests_by_spreadsheet[loc.sheet_id].setdefault(range_name, []).append((payload, key))
 
-        for sheet_id, ranges in requests_by_spreadsheet.items():
-            fetched_values_map = self.client.batch_get_data(sheet_id, ranges)
+        # (row_index, key) -> giá trị mới; chỉ gán vào payload sau khi đọc xong tất cả
+        hydrated: Dict[Tuple[int, str], Any] = {}
+        call_counts = await asyncio.gather(*(
+            self._hydrate_spreadsheet(sheet_id, targets_by_range, hydrated)
+            for sheet_id, targets_by_range in requests_by_spreadsheet.items()
+        ))
+        total_calls = sum(call_counts)
 
-            for response_range, raw_value in fetched_values_map.items():
-                key = range_to_key_map.get(response_range)
-                if not key:
+        # Payload được dùng lại giữa các round và có thể đang được worker xử lý:
+        # gán giá trị mới (hoặc mặc định nếu ô trống) một lượt để worker không thấy trạng thái dở dang.
+        # Range đọc lỗi giữ nguyên giá trị cũ thay vì mất min/max/blacklist
+        for payload in payloads:
+            for key in ("min_price", "max_price", "stock", "black_list"):
+                value = hydrated.get((payload.row_index, key), MISSING)
+                if value is MISSING:
                     continue
+                field_name = f"fetched_{key}"
+                setattr(payload, field_name, value if value is not None else Payload.model_fields[field_name].default)
+
+        if len(payloads) > 1:
+            cache_stats = self._value_cache.stats()
+            logging.info(f"Hydrated {len(payloads)} payloads from {len(requests_by_spreadsheet)} spreadsheets "
+                         f"in {total_calls} batchGet calls (cache hits={cache_stats['hits']}, "
+                         f"misses={cache_stats['misses']}, size={cache_stats['size']}).")
+        return payloads
 
+    async def _hydrate_spreadsheet(
+            self,
+            sheet_id: str,
+            targets_by_range: Dict[str, List[Tuple[Payload, str]]],
+            hydrated: Dict[Tuple[int, str], Any]
+    ) -> int:
+        """Hydrate các payload trỏ tới một spreadsheet, trả về số lần gọi batchGet."""
+        # (range, key) -> giá trị đã xử lý, lấy từ cache hoặc từ batchGet
+        processed_values: Dict[Tuple[str, str], Any] = {}
+        ranges_to_fetch = []
+        for range_name, targets in targets_by_range.items():
+            is_missing = False
+            for key in dict.fromkeys(key for _, key in targets):
+                cached_value = self._value_cache.get((sheet_id, range_name, key))
+                if cached_value is MISSING:
+                    is_missing = True
+                else:
+                    processed_values[(range_name, key)] = cached_value
+            if is_missing:
+                ranges_to_fetch.append(range_name)
+
+        chunk_size = max(1, settings.HYDRATION_CHUNK_SIZE)
+        chunks = [ranges_to_fetch[i:i + chunk_size] for i in range(0, len(ranges_to_fetch), chunk_size)]
+        fetched_values_map: Dict[str, Any] = {}
+        for chunk_values in await asyncio.gather(*(self.client.batch_get_data(sheet_id, chunk) for chunk in chunks)):
+            fetched_values_map.update(chunk_values)
+
+        for range_name in ranges_to_fetch:
+            if range_name not in fetched_values_map:
+                continue
+            raw_value = fetched_values_map[range_name]
+            for key in dict.fromkeys(key for _, key in targets_by_range[range_name]):
+                if (range_name, key) in processed_values:
+                    continue
                 processed_value = _process_fetched_value(key, raw_value)
+                processed_values[(range_name, key)] = processed_value
+                self._value_cache.set((sheet_id, range_name, key), processed_value, ttl=self._cache_ttl[key])
+
+        for range_name, targets in targets_by_range.items():
+            for payload, key in targets:
+                if (range_name, key) in processed_values:
+                    hydrated[(payload.row_index, key)] = processed_values[(range_name, key)]
+
+        return len(chunks)
+
+    def _dedupe_log_updates(self, updates: List[tuple]) -> List[tuple]:
+        """
+        Bỏ các lần ghi note/last_update không làm thay đổi nội dung.
+        Note được so sánh sau khi bỏ timestamp; last_update chỉ được làm mới
+        khi note đổi hoặc đã quá LOG_HEARTBEAT_INTERVAL giây kể từ lần ghi trước.
+        """
+        heartbeat = settings.LOG_HEARTBEAT_INTERVAL
+        if heartbeat <= 0:
+            return updates
+
+        now = time.time()
+        deduped = []
+        for payload, log_data in updates:
+            note = log_data.get('note')
+            if note is None:
+                deduped.append((payload, log_data))
+                continue
+
+            last_written = self._written_notes.get(payload.row_index)
+            if last_written is None and payload.note is not None:
+                # Chưa ghi lần nào từ khi chạy -> so với giá trị đọc được từ sheet
+                last_written = (_normalize_note(payload.note), _parse_last_update(payload.last_update))
 
-                if processed_value is not None:
-                    setattr(payload, f"fetched_{key}", processed_value)
+            if last_written is not None and last_written[0] == _normalize_note(note) \
+                    and now - last_written[1] < heartbeat:
+                continue
+            deduped.append((payload, log_data))
 
-        return payload
+        skipped = len(updates) - len(deduped)
+        if skipped:
+            logging.info(f"Skipped {skipped}/{len(updates)} unchanged log writes.")
+        return deduped
 
-    def batch_update_logs(self, updates: List[tuple]):
+    async def batch_update_logs(self, updates: List[tuple]):
         """
         Nhận vào một list các tuple (payload, log_data).
         Gom tất cả thành 1 request batchUpdate gửi lên Google.
         """
+        updates = self._dedupe_log_updates(updates)
         if not updates:
             return
 
@@ -147,8 +432,12 @@ class SheetService:
             if all_requests:
                 logging.info(f"Batch updating {len(updates)} rows to Google Sheets...")
                 # Gửi 1 lần duy nhất
-                self.client.batch_update(settings.MAIN_SHEET_ID, all_requests)
-                logging.info("Batch update completed successfully.")
+                if await self.client.batch_update(settings.MAIN_SHEET_ID, all_requests):
+                    written_at = time.time()
+                    for payload, log_data in updates:
+                        if log_data.get('note') is not None:
+                            self._written_notes[payload.row_index] = (_normalize_note(log_data['note']), written_at)
+                    logging.info("Batch update completed successfully.")
 
         except Exception as e:
             logging.error(f"Error during batch update logs: {e}")
@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS own_offers (
+    offer_id TEXT PRIMARY KEY,
+    body_json TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS competitors (
+    prod_id TEXT NOT NULL,
+    country TEXT NOT NULL,
+    listing_json TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (prod_id, country)
+);
+"""
+# Snapshot chỉ là cache: khi đổi schema thì xoá bảng cũ và tạo lại
+_SCHEMA_VERSION = 5
+
+# (prod_id, country)
+CompetitorKey = Tuple[str, str]
+
+
+class SnapshotStore:
+    """
+    Lưu offer của mình và listing đối thủ gần nhất vào SQLite ở chế độ WAL
+    để lần khởi động sau không phải lấy lại từ API. Hàng của sheet chính không được lưu:
+    min/max/blacklist phải đọc mới trước khi đặt giá, nên lần đọc sheet đầu tiên là bắt buộc.
+    Các hàm đều đồng bộ; gọi qua asyncio.to_thread từ event loop.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+            self._conn.executescript(
+                "DROP TABLE IF EXISTS meta; DROP TABLE IF EXISTS payload_rows; "
+                "DROP TABLE IF EXISTS own_offers; DROP TABLE IF EXISTS competitors;"
+            )
+            self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _write(self, statements: Iterable[Tuple[str, Iterable[tuple]]]):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for sql, rows in statements:
+                    self._conn.executemany(sql, rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # --- Offer của mình và giá đối thủ ---
+    def save_offers(
+            self,
+            own_offers: Dict[str, Tuple[str, float]],
+            competitors: Dict[CompetitorKey, Tuple[str, float]],
+            stale_offer_ids: Iterable[str] = (),
+            max_age: Optional[float] = None
+    ):
+        """
+        Upsert các offer/đối thủ vừa lấy được, xoá các offer đã bị sửa giá sau lần lấy đó
+        và (nếu có max_age) các bản ghi đã quá cũ để file không phình mãi.
+        """
+        prune_before = [(time.time() - max_age,)] if max_age is not None else []
+        self._write([
+            ("DELETE FROM own_offers WHERE fetched_at < ?", prune_before),
+            ("DELETE FROM competitors WHERE fetched_at < ?", prune_before),
+            ("DELETE FROM own_offers WHERE offer_id = ?", [(offer_id,) for offer_id in stale_offer_ids]),
+            ("INSERT OR REPLACE INTO own_offers VALUES (?, ?, ?)", [
+                (offer_id, body_json, fetched_at) for offer_id, (body_json, fetched_at) in own_offers.items()
+            ]),
+            ("INSERT OR REPLACE INTO competitors VALUES (?, ?, ?, ?)", [
+                (prod_id, country, listing_json, fetched_at)
+                for (prod_id, country), (listing_json, fetched_at) in competitors.items()
+            ]),
+        ])
+
+    def load_offers(
+            self,
+            max_age: float,
+            competitor_max_age: float
+    ) -> Tuple[Dict[str, Tuple[str, float]], Dict[CompetitorKey, Tuple[str, float]]]:
+        """Danh sách đối thủ dùng để đặt giá nên có hạn riêng, ngắn hơn nhiều so với offer của mình."""
+        min_fetched_at = time.time() - max_age
+        min_competitor_fetched_at = time.time() - competitor_max_age
+        with self._lock:
+            own_offers = {
+                offer_id: (body_json, fetched_at)
+                for offer_id, body_json, fetched_at in self._conn.execute(
+                    "SELECT offer_id, body_json, fetched_at FROM own_offers WHERE fetched_at >= ?", (min_fetched_at,)
+                )
+            }
+            competitors = {
+                (prod_id, country): (listing_json, fetched_at)
+                for prod_id, country, listing_json, fetched_at in self._conn.execute(
+                    "SELECT prod_id, country, listing_json, fetched_at FROM competitors WHERE fetched_at >= ?",
+                    (min_competitor_fetched_at,)
+                )
+            }
+        return own_offers, competitors
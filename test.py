@@ -1,8 +1,13 @@
 import asyncio
+import json
 import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
+from clients.base_rest_client import BaseRestAPIClient
 from clients.g2g_client import G2aClient
 from logic.auth import AuthHandler
+from models.g2g_models import HotOffersResponse
 from services.g2a_service import G2AService
 
 
@@ -62,9 +67,7 @@ async def test_get_compare_service():
                 return
             print(f"Found {len(offers)} offers for product {product_id}.")
             for offer in offers:
-                print(f"- Seller: {offer.seller.name}, "
-                      f"Price: {offer.price.retail.final[0].value} {offer.price.retail.final[0].currency_code}, "
-                      f"Rating: {offer.seller.rating}%")
+                print(f"- Seller: {offer.get_seller_name()}, Price: {offer.get_price_value()}")
 
         except Exception as e:
             logging.error(f"An error occurred: {e}", exc_info=True)
@@ -90,6 +93,80 @@ async def test_get_offer_detail():
         await g2a_client.close()
 
 
+class _OffersStandInHandler(BaseHTTPRequestHandler):
+    """
+    Giả lập /v3/products/{id}/offers có ETag, đếm số lần trả body đầy đủ / 304.
+    Đặt etag = None để server trả 200 không kèm validator.
+    """
+    etag = '"offers-v1"'
+    body = json.dumps({
+        "data": [{
+            "id": "offer-1",
+            "price": {"retail": {"base": {"countryCode": "DE", "currencyCode": "EUR", "value": "9.99"},
+                                 "final": []}},
+            "seller": {"name": "Seller A", "rating": 99, "ratingsCount": 10, "tier": "gold"},
+            "inventory": {"range": "1-10"}
+        }],
+        "meta": {"page": 1, "itemsPerPage": 20, "totalResults": 1}
+    }).encode()
+    counts = {"200": 0, "304": 0}
+
+    def do_GET(self):
+        if self.etag and self.headers.get("If-None-Match") == self.etag:
+            self.counts["304"] += 1
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.end_headers()
+            return
+        self.counts["200"] += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        if self.etag:
+            self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _StandInClient(BaseRestAPIClient):
+    async def _prepare_payload(self, auth_required: bool = False, **kwargs):
+        return kwargs
+
+
+async def test_conditional_get():
+    _OffersStandInHandler.etag = '"offers-v1"'
+    _OffersStandInHandler.counts = {"200": 0, "304": 0}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OffersStandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = _StandInClient(base_url=f"http://127.0.0.1:{server.server_address[1]}")
+    try:
+        endpoint = "/v3/products/10000070179155/offers"
+        first = await client.get(endpoint, HotOffersResponse, countryCode="DE")
+        second = await client.get(endpoint, HotOffersResponse, countryCode="DE")
+
+        print(f"Server responses: {_OffersStandInHandler.counts}")
+        print(f"Validator cache: {client.get_validator_cache_stats()}")
+        print(f"Reused parsed model on 304: {second is first}")
+        print(f"Lowest offer: {first.get_offers()[0].get_seller_name()} = {first.get_offers()[0].get_price_value()}")
+        assert _OffersStandInHandler.counts == {"200": 1, "304": 1}
+        assert second is first
+        assert client.get_validator_cache_stats()['size'] == 1
+
+        # Server bỏ ETag: 200 không có validator phải xoá entry cũ, lần sau không gửi If-None-Match nữa
+        _OffersStandInHandler.etag = None
+        third = await client.get(endpoint, HotOffersResponse, countryCode="DE")
+        assert third is not first
+        assert client.get_validator_cache_stats()['size'] == 0
+        await client.get(endpoint, HotOffersResponse, countryCode="DE")
+        assert _OffersStandInHandler.counts == {"200": 3, "304": 1}
+    finally:
+        await client.close()
+        server.shutdown()
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     asyncio.run(test_get_offer_detail())
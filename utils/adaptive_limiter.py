@@ -0,0 +1,86 @@
+import asyncio
+import collections
+import logging
+from typing import Deque, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveLimiter:
+    """
+    Giới hạn số request đang chạy đồng thời theo kiểu AIMD:
+    mỗi request thành công tăng limit thêm increase / limit (≈ +increase sau mỗi
+    "vòng" limit request), mỗi tín hiệu quá tải (429, 5xx, queue limit) nhân limit
+    với decrease_factor. Các request bắt đầu trước lần giảm gần nhất không làm giảm
+    thêm lần nữa, nên một đợt lỗi đồng thời chỉ giảm limit một lần.
+    """
+
+    def __init__(
+            self,
+            min_limit: int,
+            max_limit: int,
+            initial_limit: int,
+            increase: float = 1.0,
+            decrease_factor: float = 0.5
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+
+        self._in_flight = 0
+        self._epoch = 0
+        self._waiters: Deque[asyncio.Future] = collections.deque()
+        self.decreases = 0
+
+    def _has_capacity(self) -> bool:
+        return self._in_flight < int(self.limit)
+
+    async def acquire(self) -> int:
+        """Chờ tới khi có slot, trả về epoch để truyền lại cho release()."""
+        if self._has_capacity() and not self._waiters:
+            self._in_flight += 1
+            return self._epoch
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # Epoch được ghi lúc cấp slot, không phải lúc coroutine chạy tiếp
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Đã được cấp slot ngay trước khi bị huỷ -> trả lại
+                self.release(waiter.result(), backpressure=False, success=False)
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, epoch: int, backpressure: bool, success: bool = True):
+        self._in_flight -= 1
+        if backpressure:
+            if epoch == self._epoch:
+                self._epoch += 1
+                self.decreases += 1
+                previous_limit = int(self.limit)
+                self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+                if int(self.limit) < previous_limit:
+                    logger.warning(f"API backpressure detected, concurrency limit lowered to {int(self.limit)}.")
+        elif success:
+            self.limit = min(float(self.max_limit), self.limit + self.increase / self.limit)
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(self._epoch)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'limit': int(self.limit),
+            'in_flight': self._in_flight,
+            'waiting': len(self._waiters),
+            'decreases': self.decreases,
+        }
@@ -13,15 +13,104 @@ class Settings(BaseSettings):
     GOOGLE_KEY_PATH: str
 
     HEADER_KEY_COLUMNS_JSON: str = '["CHECK", "Product_name", "Product_pack"]'
-    SLEEP_TIME: int = 5
 
     BASE_URL: str = 'https://api.g2a.com/'
     AUTH_URL: str = 'https://api.g2a.com/oauth/token'
 
     CLIENT_ID: str
     AUTH_SECRET: str
+    # Làm mới token ở nền trước khi hết hạn bao nhiêu giây
+    AUTH_REFRESH_AHEAD: int = 120
+    # File lưu token giữa các lần chạy (quyền 0600), để trống để tắt
+    TOKEN_CACHE_PATH: str = 'data/token_cache.json'
     WORKERS: int = 1
 
+    # Connection pool dùng chung cho mọi HTTP client (HTTP/2 cần cài thêm gói h2: pip install httpx[http2])
+    HTTP2_ENABLED: bool = False
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    # Số kết nối tới G2A mở sẵn khi khởi động
+    HTTP_WARMUP_CONNECTIONS: int = 10
+    # Parse JSON response: 'pydantic' (validate thẳng từ bytes) hoặc 'orjson' (cần pip install orjson)
+    JSON_BACKEND: str = 'pydantic'
+    # GET có điều kiện (ETag / Last-Modified): giữ model đã parse theo URL + params, 304 thì dùng lại.
+    # Số URL tối đa (0 = tắt) và thời gian giữ validator (giây)
+    HTTP_VALIDATOR_CACHE_SIZE: int = 5000
+    HTTP_VALIDATOR_CACHE_TTL: float = 3600.0
+
+    # Giới hạn request G2A đồng thời, tự điều chỉnh (AIMD) theo 429/5xx/queue limit
+    API_CONCURRENCY_MIN: int = 1
+    API_CONCURRENCY_MAX: int = 50
+    API_CONCURRENCY_INITIAL: int = 10
+    API_CONCURRENCY_DECREASE_FACTOR: float = 0.5
+
+    # Retry request G2A: backoff có jitter (ưu tiên Retry-After), tổng số retry không quá
+    # RETRY_BUDGET_RATIO * số request trong 60 giây gần nhất
+    RETRY_MAX_ATTEMPTS: int = 4
+    RETRY_BASE_DELAY: float = 0.5
+    RETRY_MAX_DELAY: float = 20.0
+    RETRY_BUDGET_RATIO: float = 0.2
+    # Circuit breaker theo endpoint: mở sau N lỗi liên tiếp (5xx/timeout/mất kết nối), thử lại sau X giây
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_TIMEOUT: float = 30.0
+
+    # Giá/loại offer của mình lấy từ cache (cập nhật theo PATCH), chỉ GET lại để đối chiếu sau số giây này
+    OWN_OFFER_RECONCILE_INTERVAL: int = 900
+    # Bỏ qua việc so giá cache với danh sách công khai trong số giây này sau khi PATCH
+    OWN_OFFER_DRIFT_GRACE: int = 300
+    # Mỗi round lấy lại toàn bộ danh sách offer của mình theo trang thay vì GET từng offer
+    OWN_OFFERS_PAGE_SIZE: int = 100
+    OWN_OFFERS_BULK_REFRESH: bool = True
+
+    # Cache danh sách đối thủ theo (product id, country)
+    COMPETITOR_CACHE_TTL: float = 30.0
+    COMPETITOR_CACHE_MAX_SIZE: int = 2000
+    # Đọc listing đối thủ theo trang (rẻ nhất trước), dừng khi đã có người bán hợp lệ đầu tiên
+    COMPETITOR_PAGE_SIZE: int = 20
+    COMPETITOR_MAX_PAGES: int = 10
+
+    # Scheduler: mỗi hàng có thời điểm đến hạn riêng thay vì chạy lại cả sheet mỗi round
+    SHEET_REFRESH_INTERVAL: int = 60
+    SCHEDULE_MIN_INTERVAL: float = 5.0
+    SCHEDULE_MAX_INTERVAL: float = 300.0
+    # Mức biến động giá (tỉ lệ thay đổi trung bình) được coi là "nóng nhất"
+    SCHEDULE_VOLATILITY_REFERENCE: float = 0.02
+    # Cột (ví dụ "AC") trên sheet chính chứa chu kỳ chạy riêng (giây) của từng hàng, để trống để tắt
+    REFRESH_INTERVAL_COLUMN: str = ''
+
+    # Ghi log lên sheet khi đủ LOG_FLUSH_SIZE hàng hoặc sau LOG_FLUSH_INTERVAL giây
+    LOG_FLUSH_SIZE: int = 50
+    LOG_FLUSH_INTERVAL: float = 10.0
+    # Note không đổi thì chỉ ghi lại (làm mới last_update) sau mỗi LOG_HEARTBEAT_INTERVAL giây, 0 = luôn ghi
+    LOG_HEARTBEAT_INTERVAL: int = 900
+
+    # Đọc sheet chính theo trang (số hàng mỗi lần gọi API), chỉ các cột Payload dùng tới
+    MAIN_SHEET_PAGE_SIZE: int = 2000
+
+    # Số range tối đa trong một lần batchGet khi hydrate cả round
+    HYDRATION_CHUNK_SIZE: int = 100
+
+    # Cache giá trị min/max/stock/blacklist đọc từ các sheet phụ (TTL tính bằng giây)
+    SHEET_CACHE_MAX_SIZE: int = 5000
+    SHEET_CACHE_TTL_MIN_PRICE: float = 120.0
+    SHEET_CACHE_TTL_MAX_PRICE: float = 120.0
+    SHEET_CACHE_TTL_STOCK: float = 60.0
+    SHEET_CACHE_TTL_BLACKLIST: float = 600.0
+
+    # Giới hạn request tới Google Sheets API theo quota mỗi phút (đọc/ghi tách riêng)
+    SHEETS_READ_PER_MINUTE: int = 60
+    SHEETS_WRITE_PER_MINUTE: int = 60
+    SHEETS_RATE_BURST: int = 5
+    SHEETS_MAX_THROTTLE_RETRIES: int = 5
+
+    # Snapshot SQLite để khởi động lại có thể chạy ngay, để trống để tắt
+    SNAPSHOT_PATH: str = 'data/snapshot.sqlite3'
+    # Dữ liệu trong snapshot cũ hơn số giây này không được dùng khi khởi động
+    SNAPSHOT_MAX_AGE: int = 1800
+    # Danh sách đối thủ trong snapshot được dùng để đặt giá nên chỉ lấy nếu mới hơn số giây này
+    SNAPSHOT_COMPETITOR_MAX_AGE: float = 30.0
+
     @property
     def HEADER_KEY_COLUMNS(self) -> List[str]:
         """Chuyển đổi chuỗi JSON của các cột key thành một danh sách Python."""
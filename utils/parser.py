@@ -1,9 +1,12 @@
 import re
 from typing import Optional
 
+_PROD_ID_PATTERN = re.compile(r'i(\d+)$')
+_UUID_PATTERN = re.compile(r'([a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12})')
+
 
 def get_prod_id(url: str) -> Optional[int]:
-    match = re.search(r'i(\d+)$', url)
+    match = _PROD_ID_PATTERN.search(url)
     if match:
         try:
             return int(match.group(1))
@@ -13,8 +16,7 @@ def get_prod_id(url: str) -> Optional[int]:
 
 
 def get_offer_id(url_or_id: str) -> Optional[str]:
-    uuid_pattern = r'([a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12})'
-    match = re.search(uuid_pattern, url_or_id)
+    match = _UUID_PATTERN.search(url_or_id)
     if match:
         return match.group(1)
     return None
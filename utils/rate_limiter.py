@@ -0,0 +1,65 @@
+import asyncio
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    """
+    Token bucket bất đồng bộ: nạp lại rate_per_minute token mỗi phút, chứa tối đa
+    `burst` token. Caller phải chờ (theo thứ tự FIFO) thay vì bị từ chối khi hết token.
+    pause() chặn toàn bộ bucket khi server trả 429 kèm gợi ý backoff.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self.rate_per_second = max(rate_per_minute, 1e-6) / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.throttled = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_second)
+            self._updated_at = now
+
+    async def acquire(self):
+        started_at = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep((1 - self._tokens) / self.rate_per_second)
+
+        waited = time.monotonic() - started_at
+        self.acquired += 1
+        if waited > 0.001:
+            self.waited += 1
+            self.wait_seconds += waited
+
+    def pause(self, seconds: float):
+        """Không cấp token nào trong `seconds` giây tới và bỏ các token đang tích luỹ."""
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._tokens = 0.0
+        self._updated_at = max(now, self._blocked_until)
+        self.throttled += 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'acquired': self.acquired,
+            'waited': self.waited,
+            'wait_seconds': round(self.wait_seconds, 3),
+            'throttled': self.throttled,
+        }